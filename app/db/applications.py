@@ -0,0 +1,64 @@
+# app/db/applications.py
+from __future__ import annotations
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Application, User
+
+Row = Tuple[int, str, str, str]  # (id, title, description, owner username)
+
+_COLUMNS = (Application.id, Application.title, Application.description, User.username)
+
+async def create(db: AsyncSession, owner: str, title: str, description: str) -> Optional[Row]:
+    """None if `owner` has no users row."""
+    async with db.begin():
+        owner_id = await db.scalar(select(User.id).where(User.username == owner))
+        if owner_id is None:
+            return None
+        app_id = (await db.execute(
+            insert(Application).returning(Application.id),
+            {"title": title, "description": description, "owner_id": owner_id},
+        )).scalar_one()
+    return app_id, title, description, owner
+
+async def owner_id(db: AsyncSession, username: str) -> Optional[int]:
+    return await db.scalar(select(User.id).where(User.username == username))
+
+async def insert_many(db: AsyncSession, owner_id: int, rows: List[Tuple[str, str]]) -> None:
+    """One transaction, one executemany for a batch of (title, description)."""
+    if not rows:
+        return
+    async with db.begin():
+        await db.execute(
+            insert(Application),
+            [{"title": t, "description": d, "owner_id": owner_id} for t, d in rows],
+        )
+
+async def get(db: AsyncSession, app_id: int) -> Optional[Row]:
+    r = (await db.execute(select(*_COLUMNS).join(Application.owner).where(Application.id == app_id))).first()
+    return tuple(r) if r else None
+
+async def list_page(db: AsyncSession, owner: Optional[str], after: int, limit: int) -> List[Row]:
+    """
+    Keyset page: rows with id > `after`, ascending, at most `limit`.
+    owner=None lists everyone's (admin). Served by the PK or by
+    (owner_id, id), so cost doesn't grow with how deep the page is.
+    """
+    q = select(*_COLUMNS).join(Application.owner).where(Application.id > after)
+    if owner is not None:
+        q = q.where(User.username == owner)
+    return [tuple(r) for r in await db.execute(q.order_by(Application.id).limit(limit))]
+
+async def stream_rows(db: AsyncSession, owner: Optional[str], yield_per: int) -> AsyncIterator[Sequence[Row]]:
+    """
+    Server-side cursor over every visible row in id order, `yield_per` rows
+    at a time. owner=None exports everyone's (admin); the filter is SQL.
+    """
+    q = select(*_COLUMNS).join(Application.owner).order_by(Application.id)
+    if owner is not None:
+        q = q.where(User.username == owner)
+    result = await db.stream(q.execution_options(yield_per=yield_per))
+    async for part in result.partitions():
+        yield part
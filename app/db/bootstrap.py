@@ -4,3 +4,7 @@ from . import models  # <-- important: register models with Base
 
 def init_db() -> None:
     Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist (older dev.db)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
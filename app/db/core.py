@@ -1,18 +1,72 @@
 from __future__ import annotations
 import os
-from sqlalchemy import create_engine
+from typing import AsyncIterator
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from app.security.settings import (
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
+
 # Local dev DB (file). Later: switch to Postgres by changing this env var.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
 
 class Base(DeclarativeBase):
     pass
 
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+def async_url(url: str) -> str:
+    """Same database through an asyncio driver: aiosqlite / asyncpg."""
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    elif u.get_backend_name() == "postgresql":
+        u = u.set(drivername="postgresql+asyncpg")
+    return u.render_as_string(hide_password=False)
+
+def _pool_args(url: str) -> dict:
+    if _is_memory(url):
+        return {}  # single shared connection; pool sizing doesn't apply
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": not _is_sqlite(url),
+    }
+
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    # WAL: readers don't block the writer (and vice versa); NORMAL is durable
+    # in WAL except for the last commits on power loss; wait instead of
+    # failing with "database is locked".
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        cur.close()
+
+def _tune(sync_engine: Engine, url: str) -> None:
+    if _is_sqlite(url) and not _is_memory(url):
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+
 # Needed for SQLite on Windows; harmless for Postgres to leave False.
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, future=True, echo=False, connect_args=connect_args)
+engine = create_engine(DATABASE_URL, future=True, echo=False, connect_args=connect_args, **_pool_args(DATABASE_URL))
+_tune(engine, DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 def get_session():
@@ -21,3 +75,33 @@ def get_session():
         yield db
     finally:
         db.close()
+
+# ---- Async engine: DB-backed routes await I/O instead of holding a threadpool thread ----
+# Created on first use (imports the driver lazily; scripts that only use the
+# sync engine don't need aiosqlite/asyncpg installed).
+_ASYNC_ENGINE: AsyncEngine | None = None
+_ASYNC_SESSION: async_sessionmaker[AsyncSession] | None = None
+
+def get_async_engine() -> AsyncEngine:
+    global _ASYNC_ENGINE, _ASYNC_SESSION
+    if _ASYNC_ENGINE is None:
+        url = async_url(DATABASE_URL)
+        _ASYNC_ENGINE = create_async_engine(url, echo=False, **_pool_args(url))
+        _tune(_ASYNC_ENGINE.sync_engine, url)
+        _ASYNC_SESSION = async_sessionmaker(_ASYNC_ENGINE, expire_on_commit=False, autoflush=False)
+    return _ASYNC_ENGINE
+
+def AsyncSessionLocal() -> AsyncSession:
+    get_async_engine()
+    return _ASYNC_SESSION()  # type: ignore[misc]
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency: one AsyncSession per request."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine() -> None:
+    global _ASYNC_ENGINE, _ASYNC_SESSION
+    eng, _ASYNC_ENGINE, _ASYNC_SESSION = _ASYNC_ENGINE, None, None
+    if eng is not None:
+        await eng.dispose()
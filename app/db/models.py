@@ -1,6 +1,6 @@
 from __future__ import annotations
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text
+from sqlalchemy import String, Integer, BigInteger, Float, ForeignKey, Index, Text
 from .core import Base
 
 class User(Base):
@@ -18,3 +18,20 @@ class Application(Base):
     description: Mapped[str] = mapped_column(Text)
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     owner: Mapped["User"] = relationship(back_populates="applications")
+
+    # per-owner listing: WHERE owner_id = ? AND id > ? ORDER BY id (keyset)
+    __table_args__ = (Index("ix_applications_owner_id", "owner_id", "id"),)
+
+class RefreshSession(Base):
+    __tablename__ = "refresh_sessions"
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+    username: Mapped[str] = mapped_column(String(32), index=True)
+    exp: Mapped[int] = mapped_column(BigInteger, index=True)  # epoch seconds
+
+class RefreshRevocation(Base):
+    # append-only log: every worker polls it to evict revoked sessions from its cache
+    __tablename__ = "refresh_revocations"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    jti: Mapped[str | None] = mapped_column(String(36), nullable=True)       # one session ...
+    username: Mapped[str | None] = mapped_column(String(32), nullable=True)  # ... or all of a user's
+    at: Mapped[float] = mapped_column(Float, index=True)  # epoch seconds (wall clock)
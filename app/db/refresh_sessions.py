@@ -0,0 +1,70 @@
+# app/db/refresh_sessions.py
+from __future__ import annotations
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from .core import SessionLocal
+from .models import RefreshRevocation, RefreshSession
+
+Row = Tuple[str, str, int]  # (jti, username, exp_epoch)
+Revocation = Tuple[int, Optional[str], Optional[str], float]  # (id, jti, username, at)
+
+def load_active(now: int) -> List[Row]:
+    with SessionLocal() as db:
+        q = select(RefreshSession.jti, RefreshSession.username, RefreshSession.exp).where(RefreshSession.exp > now)
+        return [tuple(r) for r in db.execute(q)]
+
+def get(jti: str) -> Optional[Tuple[str, int]]:
+    with SessionLocal() as db:
+        r = db.execute(select(RefreshSession.username, RefreshSession.exp).where(RefreshSession.jti == jti)).first()
+        return (r[0], r[1]) if r else None
+
+def insert_many(rows: Iterable[Row]) -> None:
+    payload = [{"jti": j, "username": u, "exp": e} for j, u, e in rows]
+    if not payload:
+        return
+    with SessionLocal.begin() as db:
+        db.execute(insert(RefreshSession), payload)
+
+def delete_jtis(jtis: Iterable[str], log: bool = True) -> None:
+    """Delete sessions; with `log`, record the revocation for other workers' caches."""
+    jtis = list(jtis)
+    if not jtis:
+        return
+    with SessionLocal.begin() as db:
+        db.execute(delete(RefreshSession).where(RefreshSession.jti.in_(jtis)))
+        if log:
+            at = time.time()
+            db.execute(insert(RefreshRevocation), [{"jti": j, "at": at} for j in jtis])
+
+def delete_user(username: str) -> int:
+    """Delete every stored session of `username` and log it. Returns rows deleted."""
+    with SessionLocal.begin() as db:
+        n = db.execute(delete(RefreshSession).where(RefreshSession.username == username)).rowcount
+        db.execute(insert(RefreshRevocation).values(username=username, at=time.time()))
+        return n or 0
+
+def delete_expired(now: int) -> None:
+    with SessionLocal.begin() as db:
+        db.execute(delete(RefreshSession).where(RefreshSession.exp <= now))
+
+# ---- revocation log ----
+def latest_revocation_id() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.max(RefreshRevocation.id))) or 0
+
+def revocations_since(last_id: int, limit: int = 1000) -> List[Revocation]:
+    with SessionLocal() as db:
+        q = (
+            select(RefreshRevocation.id, RefreshRevocation.jti, RefreshRevocation.username, RefreshRevocation.at)
+            .where(RefreshRevocation.id > last_id)
+            .order_by(RefreshRevocation.id)
+            .limit(limit)
+        )
+        return [tuple(r) for r in db.execute(q)]
+
+def prune_revocations(before: float) -> None:
+    with SessionLocal.begin() as db:
+        db.execute(delete(RefreshRevocation).where(RefreshRevocation.at < before))
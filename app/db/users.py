@@ -0,0 +1,26 @@
+# app/db/users.py
+from __future__ import annotations
+from typing import Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from .core import AsyncSessionLocal
+from .models import User
+
+Row = Tuple[str, str, str]  # (username, password_hash, role)
+
+async def get(username: str) -> Optional[Row]:
+    async with AsyncSessionLocal() as db:
+        r = (await db.execute(
+            select(User.username, User.password_hash, User.role).where(User.username == username)
+        )).first()
+        return tuple(r) if r else None
+
+async def insert_user(username: str, password_hash: str, role: str) -> None:
+    """Raises sqlalchemy IntegrityError if the username is taken."""
+    async with AsyncSessionLocal() as db, db.begin():
+        await db.execute(insert(User), {"username": username, "password_hash": password_hash, "role": role})
+
+async def count() -> int:
+    async with AsyncSessionLocal() as db:
+        return int(await db.scalar(select(func.count()).select_from(User)) or 0)
@@ -1,34 +1,57 @@
-from fastapi import FastAPI
-from app.security.headers import security_headers
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from app.security.cors import add_cors
-from app.security.logging import setup_logging, RequestIDMiddleware
+from app.security.logging import setup_logging
+from app.security.middleware import SecurityObservabilityMiddleware
 from app.routes_auth import router as auth_router
 from app.routes_bac import router as bac_router
 from app.routes_apps import private as apps_router
 from app.security.settings import APP_ENV, SECRET_KEY,STRICT_SECRETS
 from app.security.crypto import enforce_secret_strength
 from app.db.bootstrap import init_db
+from app.db.core import dispose_async_engine
 from app.security.limits import BodySizeLimit
-from app.security.settings import BODY_MAX_BYTES
+from app.security.settings import BODY_MAX_BYTES, BODY_MAX_BYTES_OVERRIDES, APPS_IMPORT_MAX_BYTES
 from app.router_dbg import router as debug_router
 from app.security.integrety import enforce_integrity_from_env
-from app.security.observability import metrics_middleware, metrics_endpoint
+from app.security.integrity_monitor import start_integrity_monitor
+from app.security.observability import metrics_endpoint, mark_worker_exit
 from app.routes_ssrf_demo import router as ssrf_router
+from app.security.ssrf import start_http_client, close_http_client
+from app.security.session import load_refresh_sessions
 
 
 
 setup_logging()
 enforce_secret_strength(SECRET_KEY, APP_ENV, strict=STRICT_SECRETS)
 init_db()
+load_refresh_sessions()  # survive restarts without mass re-login
 enforce_integrity_from_env()
 
-app = FastAPI(title="OWASP Top 10 Starter")
-app.add_middleware(BodySizeLimit, max_body_bytes=BODY_MAX_BYTES)
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await start_http_client()   # one pooled outbound client per worker
+    monitor = start_integrity_monitor()  # incremental re-checks after the startup pass
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+        await close_http_client()
+        await dispose_async_engine()
+        mark_worker_exit()          # multiprocess metrics: drop this worker's live gauges
 
-# Middlewares
-app.middleware("http")(security_headers)
-app.add_middleware(RequestIDMiddleware)
+app = FastAPI(title="OWASP Top 10 Starter", lifespan=lifespan)
+# bulk import streams a larger body; still capped (operator overrides win)
+_body_overrides = {"/applications/import": APPS_IMPORT_MAX_BYTES, **BODY_MAX_BYTES_OVERRIDES}
+app.add_middleware(BodySizeLimit, max_body_bytes=BODY_MAX_BYTES, overrides=_body_overrides)
+
+# Middlewares (last added = outermost): one fused layer for request ID,
+# metrics and security headers wraps CORS and the body limit.
 add_cors(app)
+app.add_middleware(SecurityObservabilityMiddleware)
 
 # ✅ Register routers 
 app.include_router(auth_router)
@@ -43,8 +66,6 @@ app.include_router(ssrf_router)
 def health():
     return {"ok": True, "service": "api", "status": "healthy"}
 
-app.middleware("http")(metrics_middleware)
-
 @app.get("/metrics")
-def _metrics():
-    return metrics_endpoint()
+def _metrics(request: Request):
+    return metrics_endpoint(request)
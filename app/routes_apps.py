@@ -1,8 +1,16 @@
-from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException, Body, Path
-from pydantic import BaseModel, Field
+import csv, io, json
+from typing import AsyncIterator, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Body, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.requests import ClientDisconnect
 from app.security.auth import get_current_user, User
 from app.security.rbac import owner_or_admin
+from app.db import applications as applications_repo
+from app.db.core import AsyncSessionLocal, get_async_session
+from app.security.settings import APPS_IMPORT_BATCH, APPS_IMPORT_MAX_ERRORS, APPS_EXPORT_YIELD_PER
 
 private = APIRouter(tags=["private"], dependencies=[Depends(get_current_user)])
 
@@ -16,34 +24,212 @@ class ApplicationOut(BaseModel):
     description: str
     owner: str  # username
 
-APPLICATIONS: Dict[int, ApplicationOut] = {}
-NEXT_ID = 1
+class ApplicationPage(BaseModel):
+    items: List[ApplicationOut]
+    next_cursor: Optional[int] = None  # pass back as ?cursor= for the next page
 
-def _create(owner: str, data: ApplicationIn) -> ApplicationOut:
-    global NEXT_ID
-    app = ApplicationOut(id=NEXT_ID, title=data.title, description=data.description, owner=owner)
-    APPLICATIONS[NEXT_ID] = app
-    NEXT_ID += 1
-    return app
+def _out(row) -> ApplicationOut:
+    app_id, title, description, owner = row
+    return ApplicationOut(id=app_id, title=title, description=description, owner=owner)
+
+async def _create(db: AsyncSession, owner: str, data: ApplicationIn) -> ApplicationOut:
+    row = await applications_repo.create(db, owner, data.title, data.description)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+    return _out(row)
 
-def _get(app_id: int) -> ApplicationOut | None:
-    return APPLICATIONS.get(app_id)
+async def _get(db: AsyncSession, app_id: int) -> ApplicationOut | None:
+    row = await applications_repo.get(db, app_id)
+    return _out(row) if row else None
 
 @private.post("/applications", response_model=ApplicationOut)
-def create_application(body: ApplicationIn = Body(...), user: User = Depends(get_current_user)):
-    return _create(owner=user.username, data=body)
+async def create_application(
+    body: ApplicationIn = Body(...),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    return await _create(db, owner=user.username, data=body)
+
+# ---- Export: declared before /applications/{app_id} so "export" isn't taken for an id ----
+_CSV_FIELDS = ["id", "title", "description", "owner"]
+
+def _csv_cell(value):
+    # CSV/formula injection: spreadsheets evaluate cells starting with = + - @
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+def _ndjson_chunk(rows) -> str:
+    return "".join(
+        json.dumps({"id": i, "title": t, "description": d, "owner": o}) + "\n" for i, t, d, o in rows
+    )
+
+def _csv_chunk(rows, header: bool = False) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    if header:
+        w.writerow(_CSV_FIELDS)
+    w.writerows([[_csv_cell(c) for c in row] for row in rows])
+    return buf.getvalue()
+
+@private.get("/applications/export")
+async def export_applications(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    user: User = Depends(get_current_user),
+):
+    """
+    Every application visible to the caller (own rows; admin: all), in id
+    order. Rows come off a server-side cursor APPS_EXPORT_YIELD_PER at a
+    time and each batch is written out as one chunk, so the first byte and
+    peak memory don't depend on table size.
+    """
+    owner = None if user.role == "admin" else user.username
+    csv_out = format == "csv"
+
+    async def chunks() -> AsyncIterator[str]:
+        if csv_out:
+            yield _csv_chunk([], header=True)   # header goes out before the query runs
+        async with AsyncSessionLocal() as db:
+            async for rows in applications_repo.stream_rows(db, owner, APPS_EXPORT_YIELD_PER):
+                yield _csv_chunk(rows) if csv_out else _ndjson_chunk(rows)
+
+    return StreamingResponse(
+        chunks(),
+        media_type="text/csv; charset=utf-8" if csv_out else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="applications.{format}"'},
+    )
 
 @private.get("/applications/{app_id}", response_model=ApplicationOut)
-def get_application(app_id: int = Path(..., ge=1), user: User = Depends(get_current_user)):
-    app = _get(app_id)
+async def get_application(
+    app_id: int = Path(..., ge=1),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    app = await _get(db, app_id)
     if not app:
         raise HTTPException(status_code=404, detail="Not found")
     # 🔒 horizontal control: only owner or admin can read it
     owner_or_admin(app.owner, user)
     return app
 
-@private.get("/applications", response_model=List[ApplicationOut])
-def list_applications(user: User = Depends(get_current_user)):
-    if user.role == "admin":
-        return list(APPLICATIONS.values())
-    return [a for a in APPLICATIONS.values() if a.owner == user.username]
+@private.get("/applications", response_model=ApplicationPage)
+async def list_applications(
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    # keyset pagination (id > cursor): flat cost at any depth, unlike OFFSET
+    owner = None if user.role == "admin" else user.username
+    rows = await applications_repo.list_page(db, owner, after=cursor, limit=limit + 1)
+    items = [_out(r) for r in rows[:limit]]
+    return ApplicationPage(items=items, next_cursor=items[-1].id if len(rows) > limit else None)
+
+# ---- Bulk import: NDJSON in, NDJSON out, constant memory ----
+_MAX_LINE_BYTES = 16 * 1024  # an ApplicationIn line is < 1 KiB; anything longer is rejected unread
+
+class _DuplexStreamingResponse(StreamingResponse):
+    # The body generator keeps reading the *request* while the response
+    # streams. StreamingResponse's disconnect listener (ASGI < 2.4) would
+    # consume those http.request messages, so stream only; a disconnect
+    # surfaces as ClientDisconnect from request.stream() instead.
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def _ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """(line_no, raw line) from the body stream; raw None = line over _MAX_LINE_BYTES."""
+    buf = bytearray()
+    line_no = 0
+    skipping = False  # inside an overlong line: drop bytes up to its newline
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl == -1:
+                if not skipping:
+                    buf += chunk[start:]
+                    if len(buf) > _MAX_LINE_BYTES:
+                        skipping = True
+                        buf.clear()
+                break
+            line_no += 1
+            if skipping:
+                skipping = False
+                yield line_no, None
+            else:
+                buf += chunk[start:nl]
+                yield line_no, bytes(buf)
+            buf.clear()
+            start = nl + 1
+    if skipping:
+        yield line_no + 1, None
+    elif buf.strip():
+        yield line_no + 1, bytes(buf)
+
+def _parse_line(raw: Optional[bytes]) -> Tuple[Optional[ApplicationIn], Optional[object]]:
+    if raw is None:
+        return None, f"line longer than {_MAX_LINE_BYTES} bytes"
+    try:
+        return ApplicationIn.model_validate(json.loads(raw)), None
+    except ValidationError as e:
+        return None, [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+    except ValueError:  # JSON syntax or bad UTF-8
+        return None, "invalid JSON"
+
+@private.post("/applications/import")
+async def import_applications(request: Request, user: User = Depends(get_current_user)):
+    """
+    Body: one ApplicationIn JSON object per line (application/x-ndjson).
+    Response (NDJSON, streamed while the upload is still being read):
+      {"line": n, "error": ...}     for every rejected line, as it happens
+      {"imported": n, "errors": m}  last line (plus "aborted" if cut short)
+    Valid rows are inserted in transactions of APPS_IMPORT_BATCH rows owned
+    by the caller; committed batches stay if the upload is aborted later.
+    """
+    async with AsyncSessionLocal() as db:
+        owner_id = await applications_repo.owner_id(db, user.username)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Unknown user")
+
+    async def results() -> AsyncIterator[str]:
+        # the session lives as long as the stream, not the endpoint call
+        async with AsyncSessionLocal() as db:
+            async for line in _import(db):
+                yield line
+
+    async def _import(db: AsyncSession) -> AsyncIterator[str]:
+        batch: List[Tuple[str, str]] = []
+        imported = errors = 0
+        aborted: Optional[str] = None
+        try:
+            async for line_no, raw in _ndjson_lines(request):
+                if raw is not None and not raw.strip():
+                    continue  # blank line
+                item, err = _parse_line(raw)
+                if err is not None:
+                    errors += 1
+                    yield json.dumps({"line": line_no, "error": err}) + "\n"
+                    if errors >= APPS_IMPORT_MAX_ERRORS:
+                        aborted = "too many errors"
+                        break
+                    continue
+                batch.append((item.title, item.description))
+                if len(batch) >= APPS_IMPORT_BATCH:
+                    await applications_repo.insert_many(db, owner_id, batch)
+                    imported += len(batch)
+                    batch.clear()
+        except StarletteHTTPException as e:
+            aborted = str(e.detail)   # 413 from BodySizeLimit mid-stream
+        except ClientDisconnect:
+            aborted = "client disconnected"
+        # rows already validated are kept, like the batches before them
+        await applications_repo.insert_many(db, owner_id, batch)
+        imported += len(batch)
+        summary = {"imported": imported, "errors": errors}
+        if aborted:
+            summary["aborted"] = aborted
+        yield json.dumps(summary) + "\n"
+
+    return _DuplexStreamingResponse(results(), media_type="application/x-ndjson")
@@ -2,12 +2,15 @@
 from fastapi import APIRouter, HTTPException, Depends, Response, Request
 from pydantic import BaseModel
 from jose import JWTError
+from starlette.concurrency import run_in_threadpool
 
 from app.users import UserCreate, create_user, verify_user, get_user
 from app.security.auth import (
     create_access_token,
     create_refresh_token,
     _decode_required,
+    get_current_user,
+    User,
 )
 from app.security.settings import (
     RATE_LIMIT_LOGIN_MAX,
@@ -17,7 +20,7 @@ from app.security.settings import (
 )
 from app.security.ratelimit import rate_limit_login_dep
 from app.security.passwords import validate_password
-from app.security.session import revoke_refresh, is_refresh_active
+from app.security.session import revoke_refresh, is_refresh_active, revoke_user_sessions
 from app.security.observability import record_auth_failure
 
 router = APIRouter(tags=["auth"])
@@ -26,26 +29,28 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
-def _create_user_compat(body: UserCreate) -> None:
+async def _create_user_compat(body: UserCreate) -> None:
     """
     Tries both common create_user signatures:
       - create_user(UserCreate)
       - create_user(username, password, role)
     """
     try:
-        return create_user(body)
+        return await create_user(body)
     except TypeError:
-        return create_user(body.username, body.password, body.role)
+        return await create_user(body.username, body.password, body.role)
 
+# /signup and /login are async: Argon2 runs on its own bounded executor
+# (app.security.pwhash), not on Starlette's shared threadpool.
 @router.post("/signup", response_model=dict)
-def signup(body: UserCreate):
+async def signup(body: UserCreate):
     # A07: password policy
     ok, msg = validate_password(body.password, body.username)
     if not ok:
         raise HTTPException(status_code=400, detail=msg)
 
     try:
-        _create_user_compat(body)
+        await _create_user_compat(body)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {"ok": True}
@@ -67,18 +72,19 @@ def _set_refresh_cookie(resp: Response, refresh_token: str):
     )
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     body: Login,
     _rl=Depends(rate_limit_login_dep(RATE_LIMIT_LOGIN_MAX, RATE_LIMIT_LOGIN_WINDOW)),
 ):
-    u = verify_user(body.username, body.password)
+    u = await verify_user(body.username, body.password)
     if not u:
         record_auth_failure("invalid_credentials")
         record_auth_failure("expired_token")
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access = create_access_token(u.username, u.role)
-    refresh = create_refresh_token(u.username)
+    # session store does sync DB I/O (flush/sweep/revoke): keep it off the event loop
+    refresh = await run_in_threadpool(create_refresh_token, u.username)
 
     resp = Response(media_type="application/json")
     _set_refresh_cookie(resp, refresh)
@@ -86,7 +92,7 @@ def login(
     return resp
 
 @router.post("/refresh", response_model=Token)
-def refresh(request: Request):
+async def refresh(request: Request):
     rt = request.cookies.get("refresh_token")
     if not rt:
         raise HTTPException(status_code=401, detail="Missing refresh cookie")
@@ -96,17 +102,17 @@ def refresh(request: Request):
             raise HTTPException(status_code=401, detail="Wrong token type")
         jti = payload.get("jti")
         sub = payload.get("sub")
-        if not jti or not sub or not is_refresh_active(jti):
+        if not jti or not sub or not await run_in_threadpool(is_refresh_active, jti):
             raise HTTPException(status_code=401, detail="Refresh revoked or expired")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh")
 
     # rotate: revoke old, issue new
-    revoke_refresh(jti)
-    user = get_user(sub)
+    await run_in_threadpool(revoke_refresh, jti)
+    user = await get_user(sub)
     role = getattr(user, "role", "candidate")
     new_access = create_access_token(sub, role)
-    new_refresh = create_refresh_token(sub)
+    new_refresh = await run_in_threadpool(create_refresh_token, sub)
 
     resp = Response(media_type="application/json")
     _set_refresh_cookie(resp, new_refresh)
@@ -130,3 +136,10 @@ def logout(request: Request, response: Response):
     response.delete_cookie("refresh_token", domain=COOKIE_DOMAIN, path="/")
     response.status_code = 204   # <-- add this line
     return response
+
+@router.post("/logout/all")
+def logout_all(response: Response, user: User = Depends(get_current_user)):
+    # Revoke every refresh session of this user (all devices)
+    revoked = revoke_user_sessions(user.username)
+    response.delete_cookie("refresh_token", domain=COOKIE_DOMAIN, path="/")
+    return {"revoked": revoked}
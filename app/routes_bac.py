@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Path
 from app.security.auth import get_current_user, User
 from app.security.rbac import require_role
-from app.users import get_user, USERS
+from app.security.session import revoke_user_sessions
+from app.users import get_user, count_users
 
 router = APIRouter(tags=["bac"])
 
@@ -12,19 +13,27 @@ def me(user: User = Depends(get_current_user)):
     return {"username": user.username, "role": user.role}
 
 @router.get("/admin/stats")
-def admin_stats(user: User = Depends(require_role("admin"))):
+async def admin_stats(user: User = Depends(require_role("admin"))):
     # Vertical access control: admin only
-    return {"users": len(USERS)}
+    return {"users": await count_users()}
+
+@router.delete("/admin/users/{username}/sessions")
+def admin_revoke_sessions(
+    username: str = Path(..., min_length=3, max_length=32),
+    user: User = Depends(require_role("admin")),
+):
+    # Admin: force-logout a user everywhere
+    return {"username": username, "revoked": revoke_user_sessions(username)}
 
 @router.get("/users/{username}")
-def user_profile(
+async def user_profile(
     username: str = Path(..., min_length=3, max_length=32),
     user: User = Depends(get_current_user),
 ):
     # Horizontal access control (anti-IDOR): owner-or-admin
     if user.role != "admin" and user.username != username:
         raise HTTPException(status_code=403, detail="Forbidden (owner or admin only)")
-    u = get_user(username)
+    u = await get_user(username)
     if not u:
         raise HTTPException(status_code=404, detail="Not found")
     return {"username": u.username, "role": u.role}
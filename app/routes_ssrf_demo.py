@@ -1,6 +1,21 @@
 # app/routes_ssrf_demo.py
-from fastapi import APIRouter, HTTPException, Query
-from app.security.ssrf import safe_http_get
+import asyncio
+import json
+from typing import Annotated, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, StringConstraints
+from app.security.auth import User, get_current_user
+from app.security.ratelimit import rate_limit_dep
+from app.security.settings import (
+    FETCH_BATCH_MAX_URLS,
+    FETCH_BATCH_CONCURRENCY,
+    FETCH_BATCH_PER_HOST,
+    FETCH_BATCH_RATE_MAX,
+    FETCH_BATCH_RATE_WINDOW,
+)
+from app.security.ssrf import safe_http_measure, validate_outbound_url_async
 
 router = APIRouter(tags=["ssrf-demo"])
 
@@ -8,11 +23,72 @@ router = APIRouter(tags=["ssrf-demo"])
 async def fetch(url: str = Query(..., min_length=5, max_length=2048)):
     # WARNING: demo only. In real code, prefer server-side integrations instead of proxying.
     try:
-        r = await safe_http_get(url)
+        # Streamed and counted, never buffered (size/time capped in settings)
+        status_code, length = await safe_http_measure(url)
         # Return limited info to avoid leaking internal details
-        return {"status": r.status_code, "length": len(r.content)}
+        return {"status": status_code, "length": length}
     except HTTPException:
         raise
     except Exception:
         # Network/timeout/etc.
         raise HTTPException(status_code=502, detail="Upstream fetch failed")
+
+Url = Annotated[str, StringConstraints(min_length=5, max_length=2048)]
+
+class BatchFetchIn(BaseModel):
+    urls: List[Url] = Field(min_length=1, max_length=FETCH_BATCH_MAX_URLS)
+
+async def _validate(url: str):
+    try:
+        return url, await validate_outbound_url_async(url), None
+    except HTTPException as e:
+        return url, None, e
+
+async def _fetch_one(url: str, global_sem: asyncio.Semaphore, host_sem: asyncio.Semaphore) -> dict:
+    # host slot first: a task queued behind a busy host must not sit on a
+    # global slot that fetches to other hosts could be using
+    async with host_sem, global_sem:
+        try:
+            status_code, length = await safe_http_measure(url)
+            return {"url": url, "status": status_code, "length": length}
+        except HTTPException as e:
+            return {"url": url, "error": e.detail, "code": e.status_code}
+        except Exception:
+            return {"url": url, "error": "Upstream fetch failed", "code": 502}
+
+@router.post("/fetch/batch")
+async def fetch_batch(
+    body: BatchFetchIn,
+    _user: User = Depends(get_current_user),
+    _rl=Depends(rate_limit_dep("fetch_batch", FETCH_BATCH_RATE_MAX, FETCH_BATCH_RATE_WINDOW)),
+):
+    """
+    Validate every URL up front, then fetch the valid ones concurrently
+    (global + per-host limits) and stream one NDJSON line per URL as soon
+    as it finishes: the batch takes about as long as its slowest fetch.
+    """
+    urls = list(dict.fromkeys(body.urls))
+    checked = await asyncio.gather(*[_validate(u) for u in urls])
+
+    async def lines():
+        # rejected URLs first: nothing was sent to them
+        for url, _target, err in checked:
+            if err is not None:
+                yield json.dumps({"url": url, "error": err.detail, "code": err.status_code}) + "\n"
+
+        global_sem = asyncio.Semaphore(FETCH_BATCH_CONCURRENCY)
+        host_sems: dict[str, asyncio.Semaphore] = {}
+        tasks = []
+        for url, target, err in checked:
+            if err is None:
+                sem = host_sems.setdefault(target[1], asyncio.Semaphore(FETCH_BATCH_PER_HOST))
+                tasks.append(asyncio.ensure_future(_fetch_one(url, global_sem, sem)))
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done) + "\n"
+        finally:
+            # client went away mid-stream: don't keep fetching for nobody
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -13,6 +13,7 @@ from .settings import (
     JWT_ISSUER, JWT_AUDIENCE, CLOCK_SKEW_SECONDS, REFRESH_DAYS
 )
 from .session import save_refresh  # is_refresh_active will be used in routes
+from .token_cache import ACCESS_TOKEN_CACHE
 
 Role = Literal["admin", "recruiter", "candidate"]
 
@@ -75,6 +76,10 @@ def _decode_required(token: str):
 
 def get_current_user(authorization = Depends(security)) -> User:
     token = authorization.credentials.strip().strip('"').strip("'")
+    # Same bearer seen moments ago -> skip signature + claim checks until its exp
+    cached = ACCESS_TOKEN_CACHE.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = _decode_required(token)
         if payload.get("typ") != "access":
@@ -83,9 +88,13 @@ def get_current_user(authorization = Depends(security)) -> User:
         role = payload.get("role")
         if not username or not role:
             raise JWTError("missing claims")
-    except JWTError:
+        user = User(username=username, role=role)  # type: ignore[arg-type]
+    except (JWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
-    return User(username=username, role=role)  # type: ignore[arg-type]
+    exp = payload.get("exp")
+    if isinstance(exp, int):
+        ACCESS_TOKEN_CACHE.put(token, user, exp)
+    return user
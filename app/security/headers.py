@@ -17,15 +17,30 @@ def _csp_for_path(path: str) -> str:
         )
     # Strict CSP for your app (tighten per your frontend needs later)
     return "default-src 'self'; object-src 'none'; base-uri 'self'; frame-ancestors 'none'"
-async def security_headers(request, call_next):
-    resp: Response = await call_next(request)
-    resp.headers.update({
+
+def _headers_for_path(path: str) -> dict[str, str]:
+    return {
         "Strict-Transport-Security": "max-age=31536000; includeSubDomains; preload",
-        "Content-Security-Policy": _csp_for_path(request.url.path),
+        "Content-Security-Policy": _csp_for_path(path),
         "X-Frame-Options": "DENY",
         "X-Content-Type-Options": "nosniff",
         "Referrer-Policy": "no-referrer",
-    })
+    }
+
+def _encode_block(headers: dict[str, str]) -> list[tuple[bytes, bytes]]:
+    return [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+# Pre-encoded raw ASGI header blocks, built once at import (no per-request strings)
+STRICT_HEADER_BLOCK = _encode_block(_headers_for_path("/"))
+DOCS_HEADER_BLOCK = _encode_block(_headers_for_path(DOCS_PREFIXES[0]))
+SECURITY_HEADER_NAMES = frozenset(k for k, _ in STRICT_HEADER_BLOCK)
+
+def header_block_for_path(path: str) -> list[tuple[bytes, bytes]]:
+    return DOCS_HEADER_BLOCK if path.startswith(DOCS_PREFIXES) else STRICT_HEADER_BLOCK
+
+async def security_headers(request, call_next):
+    resp: Response = await call_next(request)
+    resp.headers.update(_headers_for_path(request.url.path))
     return resp
 
 
@@ -1,11 +1,22 @@
 # app/security/integrity.py
 from __future__ import annotations
-import hashlib, json, os
-from typing import List, Dict, Tuple
+import hashlib, hmac, json, os, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 import structlog
 
+from app.security.observability import (
+    INTEGRITY_LAST_CHECK,
+    INTEGRITY_MISMATCHES,
+    INTEGRITY_MISMATCHES_TOTAL,
+    INTEGRITY_VERIFY_DURATION,
+)
+from app.security.settings import INTEGRITY_WORKERS, INTEGRITY_CACHE, INTEGRITY_FULL_RECHECK_SECONDS
+
 log = structlog.get_logger(__name__)
 
+_READ_SIZE = 1024 * 1024  # large reads: fewer syscalls, hashlib drops the GIL per update
+
 def sha256(path: str) -> str:
     digest, _ = sha256_of_file(path)
     return digest
@@ -15,57 +26,205 @@ def _repo_root() -> str:
     return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 def sha256_of_file(path: str) -> Tuple[str, int]:
-    h = hashlib.sha256()
+    digest, total, _norm = sha256_with_crlf_fallback(path)
+    return digest, total
+
+def sha256_with_crlf_fallback(path: str) -> Tuple[str, int, Optional[Tuple[str, int]]]:
+    """
+    One streaming pass -> (sha256, bytes, normalized) where `normalized` is
+    the (sha256, bytes) of the content with CRLF -> LF, or None if the file
+    has no CR at all (then it equals the raw digest). No file is read twice.
+    """
+    raw = hashlib.sha256()
+    norm = None          # forked from `raw` at the first CR we see
+    norm_total = 0
+    held_cr = False      # chunk ended in "\r": its "\n" may start the next chunk
     total = 0
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-            total += len(chunk)
-    return h.hexdigest(), total
+        # small files get a small buffer (no 1 MiB allocation per manifest entry)
+        buf = bytearray(max(1, min(_READ_SIZE, os.fstat(f.fileno()).st_size + 1)))
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            if norm is None and buf.find(b"\r", 0, n) != -1:
+                norm = raw.copy()
+                norm_total = total
+            raw.update(chunk)
+            total += n
+            if norm is not None:
+                data = (b"\r" if held_cr else b"") + bytes(chunk)
+                held_cr = data.endswith(b"\r")
+                if held_cr:
+                    data = data[:-1]
+                data = data.replace(b"\r\n", b"\n")
+                norm.update(data)
+                norm_total += len(data)
+    if norm is None:
+        return raw.hexdigest(), total, None
+    if held_cr:
+        norm.update(b"\r")
+        norm_total += 1
+    return raw.hexdigest(), total, (norm.hexdigest(), norm_total)
+
+def merkle_root(entries: List[Dict]) -> str:
+    """
+    Root hash over (path, sha256, bytes) of every entry, sorted by path.
+    Leaves and inner nodes are domain-separated; an odd node is promoted.
+    """
+    level = [
+        hashlib.sha256(b"\0" + f"{e['path']}\0{e['sha256'].lower()}\0{int(e.get('bytes', -1))}".encode()).digest()
+        for e in sorted(entries, key=lambda e: e["path"])
+    ]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        nxt = [hashlib.sha256(b"\1" + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+# ---- Verification cache: path -> stat tuple of a file that hashed OK ----
+# Authenticated with an HMAC under SECRET_KEY, so someone who can write the
+# cache file still can't vouch for a tampered asset. ctime is part of the key:
+# unlike mtime it can't be set back by hand after an in-place edit.
+
+def _stat_key(st: os.stat_result) -> List[int]:
+    return [st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns]
+
+def _cache_mac(body: Dict) -> str:
+    from app.security.settings import SECRET_KEY
+    msg = json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+    return hmac.new(b"integrity-cache\0" + SECRET_KEY.encode(), msg, hashlib.sha256).hexdigest()
+
+def _load_cache(path: str) -> Tuple[Dict[str, Dict], float, Optional[str]]:
+    """
+    Returns (entries, last_full_check_epoch, manifest merkle root); empty if
+    missing, forged or due for a full pass.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        body, mac = data["body"], data["mac"]
+    except FileNotFoundError:
+        return {}, 0.0, None
+    except Exception as e:
+        log.warning("integrity_cache_unreadable", path=path, error=str(e))
+        return {}, 0.0, None
+    if not hmac.compare_digest(str(mac), _cache_mac(body)):
+        log.warning("integrity_cache_bad_mac", path=path)
+        return {}, 0.0, None
+    full_at = float(body.get("full_at", 0))
+    if time.time() - full_at >= INTEGRITY_FULL_RECHECK_SECONDS:
+        return {}, 0.0, None  # scheduled full re-hash
+    return body.get("entries", {}), full_at, body.get("root")
+
+def _save_cache(path: str, entries: Dict[str, Dict], full_at: float, root: Optional[str] = None) -> None:
+    body = {"full_at": full_at, "entries": entries, "root": root}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"body": body, "mac": _cache_mac(body)}, fh)
+        os.replace(tmp, path)  # atomic: concurrent workers never see half a file
+    except OSError as e:
+        log.warning("integrity_cache_write_failed", path=path, error=str(e))
+
+def _check_entry(base: str, entry: Dict, cached: Optional[Dict[str, Dict]] = None) -> Tuple[List[Dict[str, str]], Optional[Dict]]:
+    """Returns (problems, cache record if the file verified OK)."""
+    rel = entry["path"]
+    expected_sha = entry["sha256"].lower()
+    expected_bytes = int(entry.get("bytes", -1))
+    full = os.path.join(base, rel)
+
+    try:
+        st = os.stat(full)
+    except FileNotFoundError:
+        return [{"path": rel, "error": "missing"}], None
+    key = _stat_key(st)
+    rec = (cached or {}).get(rel)
+    if rec and rec["stat"] == key and rec["sha256"] == expected_sha and rec["bytes"] == expected_bytes:
+        return [], rec  # unchanged since it last verified: skip hashing
+
+    actual_sha, actual_bytes, normalized = sha256_with_crlf_fallback(full)
+
+    ok = (actual_sha == expected_sha) and (
+        expected_bytes == -1 or expected_bytes == actual_bytes
+    )
+    if not ok and normalized is not None:
+        # --- Windows newline fallback: if only CRLF vs LF differs, accept it ---
+        norm_sha, norm_bytes = normalized
+        ok = norm_sha == expected_sha and (expected_bytes == -1 or expected_bytes == norm_bytes)
+    if ok:
+        # only cache if the file didn't change while we were hashing it
+        if _stat_key(os.stat(full)) == key:
+            return [], {"stat": key, "sha256": expected_sha, "bytes": expected_bytes}
+        return [], None
 
-def verify_checksums(manifest_path: str, strict: bool = True) -> List[Dict[str, str]]:
+    problems: List[Dict[str, str]] = []
+    if actual_sha != expected_sha:
+        problems.append({"path": rel, "error": "sha256 mismatch"})
+    if expected_bytes != -1 and expected_bytes != actual_bytes:
+        problems.append({"path": rel, "error": f"size mismatch: {actual_bytes} != {expected_bytes}"})
+    return problems, None
+
+def _all_unchanged(base: str, cached: Dict[str, Dict]) -> bool:
+    for rel, rec in cached.items():
+        try:
+            if _stat_key(os.stat(os.path.join(base, rel))) != rec["stat"]:
+                return False
+        except OSError:
+            return False
+    return True
+
+def verify_checksums(manifest_path: str, strict: bool = True, cache_path: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Verify every manifest entry. With `cache_path`, files whose stat tuple
+    matches an authenticated earlier success are not re-hashed (a full
+    re-hash is forced every INTEGRITY_FULL_RECHECK_SECONDS).
+
+    Manifests written by tools/make_integrity.py carry a `merkle_root`: the
+    entry list must hash to it, and when the cache vouches for that same
+    root the check is one stat per file with no per-entry comparison.
+    """
+    started = time.perf_counter()
     problems: List[Dict[str, str]] = []
     base = _repo_root()
+    cached, full_at, cached_root = _load_cache(cache_path) if cache_path else ({}, 0.0, None)
+    if not cached:
+        full_at = time.time()
 
     with open(manifest_path, "r", encoding="utf-8") as fh:
         data = json.load(fh)
 
     entries = data.get("files", []) if isinstance(data, dict) else data
-    for entry in entries:
-        rel = entry["path"]
-        expected_sha = entry["sha256"].lower()
-        expected_bytes = int(entry.get("bytes", -1))
-        full = os.path.join(base, rel)
-
-        if not os.path.exists(full):
-            problems.append({"path": rel, "error": "missing"})
-            continue
-
-        actual_sha, actual_bytes = sha256_of_file(full)
-
-        ok = (actual_sha.lower() == expected_sha) and (
-            expected_bytes == -1 or expected_bytes == actual_bytes
-        )
-
-        if not ok:
-            # --- Windows newline fallback: if only CRLF vs LF differs, accept it ---
-            try:
-                with open(full, "rb") as f2:
-                    raw = f2.read()
-                norm = raw.replace(b"\r\n", b"\n")
-                norm_sha = hashlib.sha256(norm).hexdigest().lower()
-                norm_bytes = len(norm)
-                if norm_sha == expected_sha and (expected_bytes == -1 or expected_bytes == norm_bytes):
-                    # treat as OK (newline-only difference)
-                    ok = True
-            except Exception as e:
-                log.debug("integrity_crlf_normalize_failed", path=rel, error=str(e))
-
-        if not ok:
-            if actual_sha.lower() != expected_sha:
-                problems.append({"path": rel, "error": "sha256 mismatch"})
-            if expected_bytes != -1 and expected_bytes != actual_bytes:
-                problems.append({"path": rel, "error": f"size mismatch: {actual_bytes} != {expected_bytes}"})
+    root = data.get("merkle_root") if isinstance(data, dict) else None
+    if root is not None and merkle_root(entries) != root:
+        # entries edited, added or dropped without regenerating the manifest
+        problems.append({"path": manifest_path, "error": "merkle root mismatch"})
+        root = None
+
+    if root is not None and root == cached_root and len(cached) == len(entries) and _all_unchanged(base, cached):
+        results = [([], cached[e["path"]]) for e in entries]   # common case: nothing moved
+    elif len(entries) > 1 and INTEGRITY_WORKERS > 1:
+        # hash concurrently (I/O + GIL-free sha256); results keep manifest order
+        with ThreadPoolExecutor(max_workers=min(INTEGRITY_WORKERS, len(entries))) as pool:
+            results = list(pool.map(lambda e: _check_entry(base, e, cached), entries))
+    else:
+        results = [_check_entry(base, e, cached) for e in entries]
+    fresh: Dict[str, Dict] = {}
+    for entry, (r, rec) in zip(entries, results):
+        problems.extend(r)
+        if rec is not None:
+            fresh[entry["path"]] = rec
+    if cache_path and (fresh != cached or root != cached_root):
+        _save_cache(cache_path, fresh, full_at, root if not problems else None)
+    INTEGRITY_VERIFY_DURATION.labels(mode="full").observe(time.perf_counter() - started)
+    INTEGRITY_LAST_CHECK.set(time.time())
+    INTEGRITY_MISMATCHES.set(len({p["path"] for p in problems}))
+    INTEGRITY_MISMATCHES_TOTAL.inc(len(problems))
 
     if problems:
         for p in problems:
@@ -88,4 +247,5 @@ def enforce_integrity_from_env() -> None:
     if not manifest:
         return
     strict = os.getenv("STRICT_INTEGRITY", "false").lower() == "true"
-    verify_checksums(manifest, strict=strict)
+    cache = os.path.join(_repo_root(), INTEGRITY_CACHE) if INTEGRITY_CACHE else None
+    verify_checksums(manifest, strict=strict, cache_path=cache)
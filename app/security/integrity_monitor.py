@@ -0,0 +1,113 @@
+# app/security/integrity_monitor.py
+from __future__ import annotations
+import asyncio, json, os, threading, time
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+
+from app.security.integrety import _check_entry, _load_cache, _repo_root, _stat_key
+from app.security.observability import (
+    INTEGRITY_LAST_CHECK,
+    INTEGRITY_MISMATCHES,
+    INTEGRITY_MISMATCHES_TOTAL,
+    INTEGRITY_VERIFY_DURATION,
+)
+from app.security.settings import INTEGRITY_CACHE, INTEGRITY_MONITOR_SECONDS, INTEGRITY_MONITOR_CPU_BUDGET
+
+log = structlog.get_logger(__name__)
+
+class IntegrityMonitor:
+    """
+    Incremental re-verification of the manifest while the app runs.
+
+    Each pass stats every entry and fully hashes only files whose stat tuple
+    differs from the last one that verified OK. Hashing is throttled to a
+    duty cycle of `cpu_budget`. Passes run in a worker thread, never on the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        manifest_path: str,
+        cpu_budget: float = INTEGRITY_MONITOR_CPU_BUDGET,
+        cache_path: Optional[str] = None,
+    ):
+        self.manifest_path = manifest_path
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.base = _repo_root()
+        # path -> record of the last good hash; seeded from the startup pass's cache
+        self._verified: Dict[str, Dict] = _load_cache(cache_path)[0] if cache_path else {}
+        # path -> (stat key when it failed, problems); unchanged failures aren't re-hashed
+        self._failing: Dict[str, Tuple[Optional[List[int]], List[Dict[str, str]]]] = {}
+        self._stop = threading.Event()
+
+    def _entries(self) -> List[Dict]:
+        with open(self.manifest_path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data.get("files", []) if isinstance(data, dict) else data
+
+    def check_once(self) -> List[Dict[str, str]]:
+        """One incremental pass (blocking). Returns current problems."""
+        started = time.perf_counter()
+        entries = self._entries()
+        for entry in entries:
+            if self._stop.is_set():
+                break
+            rel = entry["path"]
+            try:
+                key: Optional[List[int]] = _stat_key(os.stat(os.path.join(self.base, rel)))
+            except OSError:
+                key = None
+            failed = self._failing.get(rel)
+            if failed is not None and failed[0] == key:
+                continue  # still the same broken file
+
+            t0 = time.perf_counter()
+            problems, rec = _check_entry(self.base, entry, self._verified)
+            spent = time.perf_counter() - t0
+            if problems:
+                self._verified.pop(rel, None)
+                for p in problems:
+                    log.error("integrity_check_failed", source="monitor", **p)
+                INTEGRITY_MISMATCHES_TOTAL.inc(len(problems))
+                self._failing[rel] = (key, problems)
+            else:
+                self._failing.pop(rel, None)
+                if rec is not None:
+                    self._verified[rel] = rec
+                else:
+                    self._verified.pop(rel, None)  # changed mid-hash: look again next pass
+            # throttle: hashing may use at most `cpu_budget` of wall time
+            # (a stat-only skip costs microseconds, so this only bites on re-hashes)
+            self._stop.wait(spent * (1 - self.cpu_budget) / self.cpu_budget)
+
+        known = {e["path"] for e in entries}
+        for rel in list(self._failing):
+            if rel not in known:  # dropped from the manifest
+                self._failing.pop(rel)
+        INTEGRITY_VERIFY_DURATION.labels(mode="incremental").observe(time.perf_counter() - started)
+        INTEGRITY_LAST_CHECK.set(time.time())
+        INTEGRITY_MISMATCHES.set(len(self._failing))
+        return [p for _key, probs in self._failing.values() for p in probs]
+
+    async def run(self, interval_s: float = INTEGRITY_MONITOR_SECONDS) -> None:
+        """Loop until cancelled (lifespan task)."""
+        try:
+            while True:
+                try:
+                    # default executor: not Starlette's request threadpool
+                    await asyncio.to_thread(self.check_once)
+                except Exception as e:
+                    log.error("integrity_monitor_failed", error=str(e))
+                await asyncio.sleep(interval_s)
+        finally:
+            self._stop.set()
+
+def start_integrity_monitor() -> Optional[asyncio.Task]:
+    """Start the background monitor if INTEGRITY_MANIFEST is set."""
+    manifest = os.getenv("INTEGRITY_MANIFEST")
+    if not manifest or INTEGRITY_MONITOR_SECONDS <= 0:
+        return None
+    cache = os.path.join(_repo_root(), INTEGRITY_CACHE) if INTEGRITY_CACHE else None
+    monitor = IntegrityMonitor(manifest, cache_path=cache)
+    return asyncio.create_task(monitor.run(), name="integrity-monitor")
@@ -1,14 +1,68 @@
 from __future__ import annotations
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Mapping
+from starlette.exceptions import HTTPException
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class BodySizeLimit(BaseHTTPMiddleware):
-    def __init__(self, app, max_body_bytes: int):
-        super().__init__(app)
+TOO_LARGE = "Request body too large"
+
+class BodySizeLimit:
+    """
+    Pure ASGI body limit. Rejects on Content-Length up front and also counts
+    streamed (chunked) bytes, aborting with 413 as soon as the cap is crossed,
+    so a hostile client can never make us buffer more than the limit.
+
+    `overrides` maps path prefixes to their own cap (longest prefix wins),
+    e.g. {"/uploads": 10 * 1024 * 1024} while JSON routes keep the default.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int, overrides: Mapping[str, int] | None = None):
+        self.app = app
         self.max = max_body_bytes
+        # longest prefix first so the most specific override wins
+        self.overrides = sorted((overrides or {}).items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.overrides:
+            if path.startswith(prefix):
+                return limit
+        return self.max
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limit_for(scope.get("path", ""))
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await JSONResponse({"detail": TOO_LARGE}, status_code=413)(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException passes straight through FastAPI's body parsing
+                    raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
 
-    async def dispatch(self, request, call_next):
-        cl = request.headers.get("content-length")
-        if cl and cl.isdigit() and int(cl) > self.max:
-            return JSONResponse({"detail": "Request body too large"}, status_code=413)
-        return await call_next(request)
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except HTTPException as exc:
+            if exc.status_code != 413 or started:
+                raise
+            await JSONResponse({"detail": TOO_LARGE}, status_code=413)(scope, receive, send)
@@ -0,0 +1,55 @@
+# app/security/middleware.py
+from __future__ import annotations
+import time
+import uuid
+
+import structlog
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.security.headers import SECURITY_HEADER_NAMES, header_block_for_path
+from app.security.observability import observe_request, route_template
+
+class SecurityObservabilityMiddleware:
+    """
+    One pure-ASGI layer for request ID, timing/metrics and security headers.
+
+    Replaces the stacked `security_headers` / `metrics_middleware` function
+    middlewares (each a BaseHTTPMiddleware) and RequestIDMiddleware: a single
+    `send` wrapper injects pre-encoded header tuples and reads the status from
+    `http.response.start`. Security headers override any the route set.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.log = structlog.get_logger()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        request_id = str(uuid.uuid4())
+        rid_header = (b"x-request-id", request_id.encode())
+        block = header_block_for_path(path)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [h for h in message.get("headers", ()) if h[0].lower() not in SECURITY_HEADER_NAMES]
+                headers.extend(block)
+                headers.append(rid_header)
+                message["headers"] = headers
+            await send(message)
+
+        self.log.info("http_start", path=path, request_id=request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            dur = time.perf_counter() - start
+            # label by route template (set in `scope` by the router), not raw path
+            observe_request(scope["method"], route_template(scope), status, dur)
+            self.log.info("http_end", path=path, request_id=request_id, duration_ms=int(dur * 1000))
@@ -0,0 +1,83 @@
+# app/security/netmatch.py
+from __future__ import annotations
+import bisect
+import ipaddress
+from typing import Iterable, List, Tuple
+
+class HostMatcher:
+    """
+    Allow-list compiled once from settings:
+      - "example.com"   exact host
+      - ".example.org"  any subdomain (host ends with ".example.org")
+    Matching is one hash lookup per label of the host, independent of the
+    number of entries.
+    """
+
+    def __init__(self, entries: Iterable[str]):
+        self.exact: set[str] = set()
+        self.suffixes: set[str] = set()
+        for entry in entries:
+            e = entry.strip().lower()
+            if not e:
+                continue
+            (self.suffixes if e.startswith(".") else self.exact).add(e)
+
+    def __bool__(self) -> bool:
+        return bool(self.exact or self.suffixes)
+
+    def __len__(self) -> int:
+        return len(self.exact) + len(self.suffixes)
+
+    def matches(self, host: str) -> bool:
+        host = host.lower()
+        if host in self.exact:
+            return True
+        if not self.suffixes:
+            return False
+        # ".b.c", ".c" for "a.b.c" (O(label count) set lookups)
+        i = host.find(".")
+        while i != -1:
+            if host[i:] in self.suffixes:
+                return True
+            i = host.find(".", i + 1)
+        return False
+
+class CidrIndex:
+    """
+    Operator CIDR blocklist as sorted, merged [start, end] integer intervals
+    per address family; lookup is a bisect, O(log n) in the number of ranges.
+    """
+
+    def __init__(self, cidrs: Iterable[str]):
+        ranges: dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        for c in cidrs:
+            c = c.strip()
+            if not c:
+                continue
+            net = ipaddress.ip_network(c, strict=False)
+            ranges[net.version].append((int(net.network_address), int(net.broadcast_address)))
+        self._starts: dict[int, List[int]] = {}
+        self._ends: dict[int, List[int]] = {}
+        self._count = 0
+        for version, items in ranges.items():
+            merged: List[Tuple[int, int]] = []
+            for start, end in sorted(items):
+                if merged and start <= merged[-1][1] + 1:
+                    if end > merged[-1][1]:
+                        merged[-1] = (merged[-1][0], end)
+                else:
+                    merged.append((start, end))
+            self._starts[version] = [s for s, _ in merged]
+            self._ends[version] = [e for _, e in merged]
+            self._count += len(merged)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def contains(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+        starts = self._starts[ip.version]
+        if not starts:
+            return False
+        n = int(ip)
+        i = bisect.bisect_right(starts, n) - 1
+        return i >= 0 and n <= self._ends[ip.version][i]
@@ -1,9 +1,25 @@
 # app/security/observability.py
 from __future__ import annotations
-import time
+import glob, gzip, os, re, time, threading
 from typing import Callable, Awaitable
 from fastapi import Request, Response
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+# settings first: prometheus_client picks multiprocess mode from the
+# environment when it is imported (and .env is loaded by settings)
+from app.security.settings import (
+    PROMETHEUS_MULTIPROC_DIR, METRICS_REAP_SECONDS, METRICS_CACHE_SECONDS, METRICS_GZIP_LEVEL,
+)
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.exposition import choose_encoder, gzip_accepted
+from prometheus_client.mmap_dict import MmapedDict
+
+try:
+    import fcntl  # POSIX: serialises dead-worker compaction against scrapes
+except Exception:
+    fcntl = None
 import structlog   # <-- add this
 
 log = structlog.get_logger(__name__)  # <-- add this
@@ -12,13 +28,13 @@ log = structlog.get_logger(__name__)  # <-- add this
 REQUESTS_TOTAL = Counter(
     "http_requests_total",
     "Count of HTTP requests",
-    ["method", "path", "status"],
+    ["method", "path", "status"],  # path = route template, e.g. /users/{username}
 )
 
 REQUEST_LATENCY = Histogram(
     "http_request_duration_seconds",
     "Request latency in seconds",
-    ["method", "path"],
+    ["method", "path"],  # path = route template
 )
 
 AUTH_FAILURES = Counter(
@@ -33,50 +49,316 @@ RATE_LIMIT_HITS = Counter(
     ["bucket"],  # e.g. login, global, ip
 )
 
+TOKEN_CACHE_EVENTS = Counter(
+    "token_cache_events_total",
+    "Verified access-token cache lookups and evictions",
+    ["event"],  # hit, miss, eviction
+)
+
+USER_CACHE_EVENTS = Counter(
+    "user_cache_events_total",
+    "User record cache lookups, evictions and invalidations",
+    ["event"],  # hit, miss, eviction, invalidation
+)
+
+PASSWORD_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hash/verify jobs waiting for an Argon2 worker",
+    multiprocess_mode="livesum",
+)
+
+PASSWORD_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a password job waited for an Argon2 worker",
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Argon2 hash/verify duration in seconds",
+    ["op"],  # hash, verify
+)
+
+# Server-side load shedding (503), kept apart from client rate limiting (429)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password hash/verify jobs refused because the Argon2 pool was full",
+)
+
+REFRESH_SESSIONS = Gauge(
+    "refresh_sessions",
+    "Active refresh sessions held in the session store",
+    multiprocess_mode="livemax",  # every worker loads the same sessions at startup
+)
+
+REFRESH_SWEEP_DURATION = Histogram(
+    "refresh_session_sweep_seconds",
+    "Time spent sweeping expired refresh sessions",
+)
+
+OUTBOUND_IN_FLIGHT = Gauge(
+    "outbound_requests_in_flight",
+    "Outbound (SSRF-guarded) HTTP requests currently in progress",
+    multiprocess_mode="livesum",
+)
+
+OUTBOUND_POOL_CONNECTIONS = Gauge(
+    "outbound_pool_connections",
+    "Connections held by the shared outbound HTTP client pool",
+    ["state"],  # active, idle
+    multiprocess_mode="livesum",
+)
+
+DNS_CACHE_EVENTS = Counter(
+    "dns_cache_events_total",
+    "Outbound DNS resolver cache lookups",
+    ["event"],  # hit, negative_hit, miss, shared (joined an in-flight query)
+)
+
+INTEGRITY_LAST_CHECK = Gauge(
+    "integrity_last_check_timestamp",
+    "Unix time of the last completed integrity check",
+    multiprocess_mode="livemax",
+)
+
+INTEGRITY_MISMATCHES = Gauge(
+    "integrity_mismatched_files",
+    "Manifest files currently failing verification",
+    multiprocess_mode="livemostrecent",
+)
+
+INTEGRITY_MISMATCHES_TOTAL = Counter(
+    "integrity_mismatches_total",
+    "Integrity problems detected (missing, sha256 or size mismatch)",
+)
+
+INTEGRITY_VERIFY_DURATION = Histogram(
+    "integrity_verification_duration_seconds",
+    "Duration of an integrity check pass",
+    ["mode"],  # full (startup), incremental (background monitor)
+)
+
 def record_auth_failure(reason: str) -> None:
     AUTH_FAILURES.labels(reason=reason).inc()
 
 def record_rate_limit(bucket: str) -> None:
     RATE_LIMIT_HITS.labels(bucket=bucket).inc()
 
+def record_password_hash_rejected() -> None:
+    PASSWORD_HASH_REJECTED.inc()
+
+def record_dns_cache(event: str) -> None:
+    DNS_CACHE_EVENTS.labels(event=event).inc()
+
+def record_token_cache(event: str, n: int = 1) -> None:
+    TOKEN_CACHE_EVENTS.labels(event=event).inc(n)
+
+def record_user_cache(event: str, n: int = 1) -> None:
+    USER_CACHE_EVENTS.labels(event=event).inc(n)
+
+# ---- Request labels: bounded no matter how many users/ids exist ----
+UNMATCHED_ROUTE = "<unmatched>"   # 404s, redirects, scanners: one series, not one per URL
+_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+_ENDPOINT_TEMPLATES: dict = {}    # endpoint -> path template, for routes that don't set scope["route"]
+
+def route_template(scope) -> str:
+    """
+    Matched route template ("/users/{username}") read from the scope after
+    the router ran; FastAPI routes record themselves in scope["route"],
+    plain Starlette routes (docs) are found once by endpoint.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", UNMATCHED_ROUTE)
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    template = _ENDPOINT_TEMPLATES.get(endpoint)
+    if template is None:
+        router = scope.get("router")
+        template = next(
+            (r.path_format for r in getattr(router, "routes", ()) if getattr(r, "endpoint", None) is endpoint),
+            UNMATCHED_ROUTE,
+        )
+        _ENDPOINT_TEMPLATES[endpoint] = template
+    return template
+
+def method_label(method: str) -> str:
+    return method if method in _METHODS else "OTHER"
+
+def observe_request(method: str, route: str, status: int | str, duration_s: float) -> None:
+    method = method_label(method)
+    REQUEST_LATENCY.labels(method=method, path=route).observe(duration_s)
+    REQUESTS_TOTAL.labels(method=method, path=route, status=str(status)).inc()
+
 # ---- Middleware to time and count requests ----
+# app.main uses the fused ASGI layer in app.security.middleware, which
+# reports through observe_request(); this variant is kept for direct use.
 async def metrics_middleware(request: Request, call_next: Callable[[Request], Awaitable[Response]]):
     start = time.perf_counter()
+    status = 500  # if call_next raises, the client gets a 500
     try:
         response = await call_next(request)
+        status = response.status_code  # what http.response.start will carry
         return response
     finally:
-        dur = time.perf_counter() - start
-        path = request.url.path
-        # Keep path cardinality stable: collapse IDs if needed
-        if path.count("/") > 3:
-            path = "/".join(path.split("/")[:3] + ["…"])
-
-        REQUEST_LATENCY.labels(method=request.method, path=path).observe(dur)
-
-        status = getattr(request.state, "forced_status", None)  # rarely used
-        code = str(
-            status
-            or getattr(request, "response_status", None)
-            or getattr(getattr(request, "response", None), "status_code", "")
-            or "200"
-        )
+        # request.scope is the dict the router filled in
+        observe_request(request.method, route_template(request.scope), status, time.perf_counter() - start)
 
-        # Best-effort fallback to app_state, but never crash
-        try:
-            code = str(request.app.router.default.app_state.get("last_status", code))
-        except Exception as e:
-            log.debug("observability_best_effort_request_status_failed", error=str(e))
+# ---- Multiprocess mode: one scrape sees every worker ----
+# Each worker writes its samples to mmap files in PROMETHEUS_MULTIPROC_DIR;
+# /metrics merges them. Gauges use live* modes, so a dead worker's gauge
+# files are simply deleted. Its counter/histogram files must keep counting,
+# so they are folded into one *_archive.db per type: the file count (and
+# scrape cost) stays bounded by live workers, not by restarts.
+MULTIPROCESS = bool(PROMETHEUS_MULTIPROC_DIR)
+_MP_REGISTRY: CollectorRegistry | None = None
+_PID_FILE = re.compile(r"^(counter|histogram|summary)_(\d+)\.db$")
+_reap_lock = threading.Lock()
+_last_reap = 0.0
 
-        # Prefer real response status if available
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class _DirLock:
+    """flock on <dir>/.lock: shared for scrapes, exclusive for compaction."""
+
+    def __init__(self, path: str, exclusive: bool):
+        self.path, self.mode = path, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else 0
+        self.fh = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fh = open(os.path.join(self.path, ".lock"), "a+")
+            fcntl.flock(self.fh, self.mode)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fh is not None:
+            fcntl.flock(self.fh, fcntl.LOCK_UN)
+            self.fh.close()
+
+def reap_dead_workers(path: str | None = PROMETHEUS_MULTIPROC_DIR) -> int:
+    """
+    Clean up after workers that exited: drop their live gauges and fold
+    their counters/histograms into the archive files. Returns pids reaped.
+    POSIX only (liveness via kill(pid, 0); compaction under flock).
+    """
+    if not path or os.name != "posix" or fcntl is None:
+        return 0
+    me = os.getpid()
+    dead: dict[int, list[tuple[str, str]]] = {}
+    for f in os.listdir(path):
+        m = _PID_FILE.match(f)
+        if m and int(m.group(2)) != me:
+            dead.setdefault(int(m.group(2)), []).append((m.group(1), f))
+    for f in glob.glob(os.path.join(path, "gauge_live*_*.db")):
+        pid = os.path.basename(f)[:-3].rsplit("_", 1)[-1]
+        if pid.isdigit() and int(pid) != me:
+            dead.setdefault(int(pid), [])
+    dead = {pid: files for pid, files in dead.items() if not _pid_alive(pid)}
+    if not dead:
+        return 0
+    with _DirLock(path, exclusive=True):
+        archives: dict[str, MmapedDict] = {}
         try:
-            code = str(response.status_code)
-        except Exception as e:
-            log.debug("observability_best_effort_response_status_failed", error=str(e))
+            for pid, files in dead.items():
+                multiprocess.mark_process_dead(pid, path)
+                for typ, name in files:
+                    full = os.path.join(path, name)
+                    if typ not in archives:
+                        archives[typ] = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+                    arch = archives[typ]
+                    for key, value, ts, _pos in MmapedDict.read_all_values_from_file(full):
+                        arch.write_value(key, arch.read_value(key)[0] + value, ts)
+                    os.remove(full)
+        finally:
+            for arch in archives.values():
+                arch.close()
+    log.info("metrics_workers_reaped", pids=sorted(dead))
+    return len(dead)
+
+def _maybe_reap() -> None:
+    global _last_reap
+    now = time.monotonic()
+    if now - _last_reap < METRICS_REAP_SECONDS or not _reap_lock.acquire(blocking=False):
+        return
+    try:
+        _last_reap = now
+        reap_dead_workers()
+    except Exception as e:
+        log.warning("metrics_reap_failed", error=str(e))
+    finally:
+        _reap_lock.release()
 
-        REQUESTS_TOTAL.labels(method=request.method, path=path, status=code).inc()
+def mark_worker_exit() -> None:
+    """Call on worker shutdown: its live gauges stop counting immediately."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid(), PROMETHEUS_MULTIPROC_DIR)
+
+def collect_metrics(encoder: Callable[[CollectorRegistry], bytes] = generate_latest) -> bytes:
+    """Exposition for this worker, or for all workers in multiprocess mode."""
+    global _MP_REGISTRY
+    if not MULTIPROCESS:
+        return encoder(REGISTRY)
+    _maybe_reap()
+    if _MP_REGISTRY is None:
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg, PROMETHEUS_MULTIPROC_DIR)
+        _MP_REGISTRY = reg
+    with _DirLock(PROMETHEUS_MULTIPROC_DIR, exclusive=False):
+        return encoder(_MP_REGISTRY)
 
 # ---- /metrics endpoint ----
-def metrics_endpoint():
+# Rendering walks every series (every worker's files in multiprocess mode).
+# Scrapes within METRICS_CACHE_SECONDS of each other (HA Prometheus pair,
+# sidecars, curl) share one rendering per format; the gzip body is cached
+# alongside on first request.
+METRICS_RENDER_SECONDS = Histogram(
+    "metrics_render_seconds",
+    "Time to render the /metrics exposition (cache misses only)",
+    ["format"],  # text, openmetrics
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0),
+)
+_render_lock = threading.Lock()
+_rendered: dict[str, list] = {}  # content type -> [expires_at, body, gzipped body | None]
+_MAX_RENDERED = 8                # content types are client-influenced (version=...)
+
+def clear_metrics_cache() -> None:
+    with _render_lock:
+        _rendered.clear()
+
+def render_metrics(accept: str = "", accept_encoding: str = "") -> tuple[bytes, str, bool]:
+    """-> (body, content type, gzipped) for the given Accept / Accept-Encoding headers."""
+    encoder, ctype = choose_encoder(accept)
+    use_gzip = gzip_accepted(accept_encoding)
+    with _render_lock:
+        entry = _rendered.get(ctype)
+        now = time.monotonic()
+        if entry is None or entry[0] <= now:
+            fmt = "openmetrics" if ctype.startswith("application/openmetrics-text") else "text"
+            started = time.perf_counter()
+            body = collect_metrics(encoder)
+            METRICS_RENDER_SECONDS.labels(format=fmt).observe(time.perf_counter() - started)
+            if len(_rendered) >= _MAX_RENDERED:
+                _rendered.clear()
+            entry = _rendered[ctype] = [now + METRICS_CACHE_SECONDS, body, None]
+        if not use_gzip:
+            return entry[1], ctype, False
+        if entry[2] is None:
+            entry[2] = gzip.compress(entry[1], compresslevel=METRICS_GZIP_LEVEL)
+        return entry[2], ctype, True
+
+def metrics_endpoint(request: Request | None = None):
     from fastapi import Response as FastAPIResponse
-    return FastAPIResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    headers = {} if request is None else request.headers
+    body, ctype, gzipped = render_metrics(headers.get("accept", ""), headers.get("accept-encoding", ""))
+    out = {"Vary": "Accept, Accept-Encoding"}
+    if gzipped:
+        out["Content-Encoding"] = "gzip"
+    return FastAPIResponse(body, media_type=ctype, headers=out)
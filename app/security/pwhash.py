@@ -0,0 +1,82 @@
+# app/security/pwhash.py
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+from passlib.hash import argon2
+
+from app.security.observability import (
+    PASSWORD_QUEUE_DEPTH,
+    PASSWORD_QUEUE_WAIT,
+    PASSWORD_HASH_DURATION,
+    record_password_hash_rejected,
+)
+from app.security.settings import (
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE,
+    PASSWORD_HASH_RETRY_AFTER,
+)
+
+T = TypeVar("T")
+
+# Argon2 (argon2-cffi) releases the GIL while hashing, so a small dedicated
+# thread pool gives real parallelism without the pickling cost of processes.
+# Keeping it separate from Starlette's shared pool means a login burst can
+# only saturate these workers, never the threads serving /me or /applications.
+_EXECUTOR = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+
+# Admission control: running + waiting jobs never exceed workers + queue.
+_SLOTS = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+def _overloaded() -> HTTPException:
+    record_password_hash_rejected()
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy, retry shortly.",
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+async def _run(op: str, fn: Callable[..., T], *args) -> T:
+    slots = _SLOTS
+    if not slots.acquire(blocking=False):
+        raise _overloaded()
+    submitted = time.perf_counter()
+    PASSWORD_QUEUE_DEPTH.inc()
+
+    def _job() -> T:
+        started = time.perf_counter()
+        PASSWORD_QUEUE_DEPTH.dec()
+        PASSWORD_QUEUE_WAIT.observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            PASSWORD_HASH_DURATION.labels(op=op).observe(time.perf_counter() - started)
+
+    def _done(f) -> None:
+        # The slot belongs to the job, not the request: a client that
+        # disconnects mid-hash must not free it while Argon2 still runs.
+        if f.cancelled():
+            PASSWORD_QUEUE_DEPTH.dec()  # never started
+        slots.release()
+
+    try:
+        job = _EXECUTOR.submit(_job)
+    except BaseException:
+        PASSWORD_QUEUE_DEPTH.dec()
+        slots.release()
+        raise
+    job.add_done_callback(_done)
+    return await asyncio.wrap_future(job)
+
+async def hash_password(password: str) -> str:
+    return await _run("hash", argon2.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await _run("verify", argon2.verify, password, password_hash)
+
+def shutdown_executor() -> None:
+    _EXECUTOR.shutdown(wait=False, cancel_futures=True)
@@ -1,50 +1,132 @@
 from __future__ import annotations
+import math
 import time
-from typing import Tuple
+from collections import OrderedDict
+from typing import List, Protocol, Tuple
 from fastapi import Request, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from app.security.observability import record_rate_limit
+from app.security.settings import RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH
 
 
-# Simple in-memory sliding window. In prod, prefer Redis.
-_BUCKETS: dict[str, list[float]] = {}
+# In-memory sliding window. In prod, prefer Redis.
+# Per key: the times of the last `limit` allowed hits (oldest first) and
+# when the key goes idle (newest hit + window). Ordered by last allowed hit,
+# so idle keys collect at the front and are evicted in small batches as
+# checks come in -> memory tracks keys active in one window.
+_BUCKETS: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+_SWEEP_EVERY = 64    # checks between sweeps
+_SWEEP_BATCH = 128   # > _SWEEP_EVERY: eviction outpaces new keys
+_calls = 0
+
+def _sweep(now: float) -> None:
+    for _ in range(_SWEEP_BATCH):
+        if not _BUCKETS:
+            return
+        key, (idle_at, _hits) = next(iter(_BUCKETS.items()))
+        if idle_at > now:
+            return
+        # every hit is older than the window: forgetting the key changes nothing
+        _BUCKETS.popitem(last=False)
 
 def _allow(key: str, limit: int, window_s: int) -> Tuple[bool, int]:
-    now = time.time()
-    window_start = now - window_s
-    bucket = _BUCKETS.setdefault(key, [])
-    # drop old hits
-    i = 0
-    while i < len(bucket) and bucket[i] < window_start:
-        i += 1
-    if i:
-        del bucket[:i]
-    if len(bucket) < limit:
-        bucket.append(now)
+    """
+    Allow at most `limit` hits in any `window_s` span, O(limit) per call.
+    Returns (ok, retry_after_seconds); retry_after is when the oldest of
+    the last `limit` hits leaves the window.
+    """
+    global _calls
+    now = time.monotonic()
+    _calls += 1
+    if not _calls % _SWEEP_EVERY:
+        _sweep(now)
+    entry = _BUCKETS.get(key)
+    if entry is None:
+        # new (or evicted) key: inserting already places it at the back
+        _BUCKETS[key] = (now + window_s, [now])
         return True, 0
-    # compute retry-after
-    retry_after = int(window_s - (now - bucket[0])) + 1
-    return False, max(retry_after, 1)
-record_rate_limit("login")
-def rate_limit_login_dep(limit: int, window_s: int):
+    hits = entry[1]
+    if len(hits) >= limit and hits[0] > now - window_s:
+        return False, max(math.ceil(hits[0] + window_s - now), 1)
+    hits.append(now)
+    if len(hits) > limit:
+        del hits[0]
+    _BUCKETS[key] = (now + window_s, hits)
+    _BUCKETS.move_to_end(key)
+    return True, 0
+
+def _reset_memory(prefix: str | None = None) -> None:
+    if prefix is None:
+        _BUCKETS.clear()
+        return
+    for k in list(_BUCKETS.keys()):
+        if k.startswith(prefix):
+            _BUCKETS.pop(k, None)
+
+# ---- Pluggable backends ----
+class RateLimitBackend(Protocol):
+    # True if allow() may block on I/O (run it off the event loop)
+    blocking: bool
+
+    def allow(self, key: str, limit: int, window_s: int) -> Tuple[bool, int]: ...
+    def reset(self, prefix: str | None = None) -> None: ...
+
+class MemoryBackend:
+    """Per-process sliding window above. Default; limits are per worker."""
+    blocking = False
+
+    def allow(self, key: str, limit: int, window_s: int) -> Tuple[bool, int]:
+        return _allow(key, limit, window_s)
+
+    def reset(self, prefix: str | None = None) -> None:
+        _reset_memory(prefix)
+
+def _make_backend(name: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        from app.security.ratelimit_sqlite import SQLiteBackend
+        return SQLiteBackend(RATE_LIMIT_SQLITE_PATH)
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {name!r}")
+
+_BACKEND: RateLimitBackend = _make_backend(RATE_LIMIT_BACKEND)
+
+def get_backend() -> RateLimitBackend:
+    return _BACKEND
+
+def set_backend(backend: RateLimitBackend) -> None:
+    global _BACKEND
+    _BACKEND = backend
+
+def rate_limit_dep(bucket: str, limit: int, window_s: int, detail: str = "Too many requests, slow down."):
     """
-    Dependency for /login: rate-limit by client IP (simple & safe).
+    Dependency: rate-limit by client IP, one bucket per endpoint family.
     """
     async def _dep(request: Request):
         client_ip = (request.client.host if request.client else "unknown")
-        key = f"login:{client_ip}"
-        ok, retry_after = _allow(key, limit, window_s)
+        key = f"{bucket}:{client_ip}"
+        backend = _BACKEND
+        if backend.blocking:
+            ok, retry_after = await run_in_threadpool(backend.allow, key, limit, window_s)
+        else:
+            ok, retry_after = backend.allow(key, limit, window_s)
         if not ok:
+            record_rate_limit(bucket)
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many login attempts, slow down.",
+                detail=detail,
                 headers={"Retry-After": str(retry_after)},
             )
     return _dep
+
+def rate_limit_login_dep(limit: int, window_s: int):
+    """
+    Dependency for /login: rate-limit by client IP (simple & safe).
+    """
+    return rate_limit_dep("login", limit, window_s, "Too many login attempts, slow down.")
+
 def reset_rate_limits(prefix: str | None = None) -> None:
-    """Clear in-memory buckets. Use in tests to avoid cross-test pollution."""
-    if prefix is None:
-        _BUCKETS.clear()
-        return
-    for k in list(_BUCKETS.keys()):
-        if k.startswith(prefix):
-            _BUCKETS.pop(k, None)
+    """Clear buckets of the active backend. Use in tests to avoid cross-test pollution."""
+    _reset_memory(prefix)
+    if not isinstance(_BACKEND, MemoryBackend):
+        _BACKEND.reset(prefix)
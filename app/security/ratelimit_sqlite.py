@@ -0,0 +1,90 @@
+# app/security/ratelimit_sqlite.py
+from __future__ import annotations
+import json
+import math
+import sqlite3
+import threading
+import time
+from typing import Tuple
+
+_SCHEMA = """
+DROP TABLE IF EXISTS rate_limits;
+CREATE TABLE IF NOT EXISTS rate_limit_windows(
+    key TEXT PRIMARY KEY,
+    hits TEXT NOT NULL,
+    idle_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_rate_limit_windows_idle_at ON rate_limit_windows(idle_at);
+"""
+
+class SQLiteBackend:
+    """
+    Sliding window shared by every worker process on one host through a
+    WAL-mode SQLite file: no outside service, and one limit for all N workers.
+
+    A row holds the times of the key's last `limit` allowed hits (JSON).
+    Each check is a BEGIN IMMEDIATE transaction (read hits, write hits), so
+    check-and-increment is atomic across processes. Expired rows are
+    deleted in batches every `sweep_every` checks, not one by one.
+    """
+    blocking = True
+
+    def __init__(self, path: str, sweep_every: int = 256, sweep_batch: int = 1024, busy_timeout_ms: int = 2000):
+        self.path = path
+        self.sweep_every = sweep_every
+        self.sweep_batch = sweep_batch
+        self._calls = 0
+        self._lock = threading.Lock()
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def allow(self, key: str, limit: int, window_s: int) -> Tuple[bool, int]:
+        with self._lock:
+            cur = self._conn.cursor()
+            now = time.time()  # wall clock: shared between processes
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                row = cur.execute("SELECT hits FROM rate_limit_windows WHERE key = ?", (key,)).fetchone()
+                hits = json.loads(row[0])[-limit:] if row else []
+                if len(hits) >= limit and hits[0] > now - window_s:
+                    cur.execute("COMMIT")
+                    return False, max(math.ceil(hits[0] + window_s - now), 1)
+                hits = (hits + [now])[-limit:]
+                cur.execute(
+                    "INSERT INTO rate_limit_windows(key, hits, idle_at) VALUES(?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET hits = excluded.hits, idle_at = excluded.idle_at",
+                    (key, json.dumps(hits), now + window_s),
+                )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            self._calls += 1
+            if not self._calls % self.sweep_every:
+                self._sweep(now)
+        return True, 0
+
+    def _sweep(self, now: float) -> None:
+        # every hit is older than the window: dropping the row changes nothing
+        self._conn.execute(
+            "DELETE FROM rate_limit_windows WHERE key IN "
+            "(SELECT key FROM rate_limit_windows WHERE idle_at <= ? LIMIT ?)",
+            (now, self.sweep_batch),
+        )
+
+    def reset(self, prefix: str | None = None) -> None:
+        with self._lock:
+            if prefix is None:
+                self._conn.execute("DELETE FROM rate_limit_windows")
+            else:
+                # substr() compare: no LIKE wildcards to escape
+                self._conn.execute(
+                    "DELETE FROM rate_limit_windows WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
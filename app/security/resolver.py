@@ -0,0 +1,96 @@
+# app/security/resolver.py
+from __future__ import annotations
+import asyncio
+import socket
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from app.security.observability import record_dns_cache
+from app.security.settings import DNS_CACHE_TTL, DNS_NEGATIVE_TTL, DNS_CACHE_MAX
+
+Lookup = Callable[[str], Awaitable[List[str]]]
+
+async def system_lookup(host: str) -> List[str]:
+    """All A/AAAA records via the loop's getaddrinfo (runs off the event loop)."""
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await loop.getaddrinfo(host, None, family=socket.AF_UNSPEC, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        return []
+    return list(dict.fromkeys(sockaddr[0] for _f, _t, _p, _c, sockaddr in infos))
+
+class AsyncResolver:
+    """
+    Non-blocking resolver with a bounded TTL cache.
+      - positive answers live `ttl` seconds, failures (no records) `negative_ttl`;
+      - concurrent lookups of the same name share one query (singleflight),
+        cancelled only once every caller waiting on it has gone.
+    `lookup` is pluggable so tests can use a local stub.
+    """
+
+    def __init__(
+        self,
+        lookup: Lookup = system_lookup,
+        ttl: float = DNS_CACHE_TTL,
+        negative_ttl: float = DNS_NEGATIVE_TTL,
+        max_entries: int = DNS_CACHE_MAX,
+    ):
+        self.lookup = lookup
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max = max_entries
+        self._cache: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        self._inflight: Dict[str, list] = {}  # host -> [query task, waiters]
+
+    async def resolve(self, host: str) -> List[str]:
+        host = host.lower()
+        now = time.monotonic()
+        rec = self._cache.get(host)
+        if rec is not None and now < rec[1]:
+            self._cache.move_to_end(host)
+            record_dns_cache("hit" if rec[0] else "negative_hit")
+            return list(rec[0])
+
+        entry = self._inflight.get(host)
+        if entry is None:
+            record_dns_cache("miss")
+            # the query is its own task: a caller going away (client disconnect)
+            # must not cancel it for the others waiting on the same name
+            task = asyncio.ensure_future(self._query(host))
+            entry = self._inflight[host] = [task, 0]
+            task.add_done_callback(lambda _t, e=entry: self._forget(host, e))
+        else:
+            record_dns_cache("shared")
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return list(await asyncio.shield(task))
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                self._forget(host, entry)  # newcomers start a fresh query
+                task.cancel()              # last waiter left
+
+    async def _query(self, host: str) -> List[str]:
+        addrs = await self.lookup(host)
+        self._store(host, addrs)
+        return addrs
+
+    def _forget(self, host: str, entry: list) -> None:
+        if self._inflight.get(host) is entry:
+            del self._inflight[host]
+
+    def _store(self, host: str, addrs: List[str]) -> None:
+        ttl = self.ttl if addrs else self.negative_ttl
+        if ttl <= 0 or self.max <= 0:
+            return
+        self._cache[host] = (addrs, time.monotonic() + ttl)
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.max:
+            self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+RESOLVER = AsyncResolver()
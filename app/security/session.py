@@ -1,19 +1,337 @@
 from __future__ import annotations
+import atexit
+import heapq
+import threading
 import time
-from typing import Dict, Tuple
+from typing import Dict, List, Set, Tuple
 
-# jti -> (username, exp_epoch)
-_REFRESH_STORE: Dict[str, Tuple[str, int]] = {}
+import structlog
+
+from app.db import refresh_sessions as session_repo
+from app.security.observability import REFRESH_SESSIONS, REFRESH_SWEEP_DURATION
+from app.security.settings import (
+    SESSION_SWEEP_SECONDS,
+    SESSION_PERSIST,
+    SESSION_FLUSH_BATCH,
+    SESSION_FLUSH_SECONDS,
+)
+
+log = structlog.get_logger(__name__)
+
+# revocation log rows are only needed until every worker has polled them
+_REVOCATION_LOG_KEEP_S = 3600
+
+class RefreshSessionStore:
+    """
+    Active refresh sessions: jti -> (username, exp_epoch).
+
+    Two indexes keep the work proportional to what is touched:
+      - a min-heap of (exp, jti) so a sweep pops only expired entries;
+      - username -> {jti} so "log out everywhere" is O(sessions of that user).
+    Revoked jtis leave a stale heap entry behind (lazy deletion); the heap is
+    rebuilt once stale entries outnumber live ones.
+
+    With `persist=True` the dict is a read-through cache over the
+    refresh_sessions table (app.db.refresh_sessions), so is_active stays a
+    dict lookup. New sessions are buffered and written in batches
+    (write-behind); revocations hit the database before returning, so a
+    logout survives a crash or deploy. Revocations are also appended to
+    refresh_revocations, which every worker's flusher polls each
+    `flush_every_s`: a session revoked or rotated on one worker stops
+    working on the others within that interval.
+    """
+
+    def __init__(
+        self,
+        sweep_every_s: int = SESSION_SWEEP_SECONDS,
+        persist: bool = False,
+        flush_batch: int = SESSION_FLUSH_BATCH,
+        flush_every_s: float = SESSION_FLUSH_SECONDS,
+    ):
+        self._by_jti: Dict[str, Tuple[str, int]] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._expiry: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+        self.sweep_every_s = sweep_every_s
+        self._next_sweep = time.time() + sweep_every_s
+        # write-behind state (persist=True only)
+        self.persist = persist
+        self.flush_batch = flush_batch
+        self.flush_every_s = flush_every_s
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._saved_at: Dict[str, float] = {}  # this worker's sessions -> wall time created
+        self._rev_cursor: int | None = None    # last refresh_revocations id applied
+        # held while a batch is being written, so a revoke can't slip between
+        # "taken from _pending" and "row inserted" and be resurrected
+        self._flush_lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    # ---- writes ----
+    def save(self, jti: str, username: str, exp_epoch: int) -> None:
+        with self._lock:
+            self._drop(jti)
+            self._cache(jti, username, exp_epoch)
+            if self.persist:
+                self._pending[jti] = (username, exp_epoch)
+                self._saved_at[jti] = time.time()
+                backlog = len(self._pending)
+        if self.persist:
+            self._ensure_flusher()
+            if backlog >= self.flush_batch:
+                try:
+                    self.flush()
+                except Exception as e:
+                    # the login already succeeded: the rows stay buffered for the flusher
+                    log.warning("refresh_session_flush_deferred", error=str(e))
+        # cheap periodic sweep piggybacks on logins/refreshes
+        if time.time() >= self._next_sweep:
+            self.sweep()
+
+    def revoke(self, jti: str) -> None:
+        with self._lock:
+            self._drop(jti)
+            unwritten = self._pending.pop(jti, None) is not None
+            self._maybe_compact()
+            REFRESH_SESSIONS.set(len(self._by_jti))
+        if self.persist and not unwritten:
+            with self._flush_lock:
+                session_repo.delete_jtis([jti])
+
+    def revoke_user(self, username: str) -> int:
+        """
+        Revoke every session of `username`. Returns how many were revoked:
+        with persistence, the user's rows in the database (this worker's
+        buffer is flushed first) plus any that could not be flushed; without,
+        this worker's sessions. Sessions other workers have not flushed yet
+        are not counted; they drop them when they poll the revocation log.
+        """
+        if self.persist:
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("refresh_session_flush_deferred", error=str(e))
+        with self._lock:
+            jtis = self._by_user.pop(username, set())
+            unwritten = 0
+            for jti in jtis:
+                self._by_jti.pop(jti, None)
+                self._saved_at.pop(jti, None)
+                unwritten += self._pending.pop(jti, None) is not None
+            self._maybe_compact()
+            REFRESH_SESSIONS.set(len(self._by_jti))
+        if self.persist:
+            with self._flush_lock:
+                return session_repo.delete_user(username) + unwritten
+        return len(jtis)
+
+    # ---- persistence ----
+    def load(self) -> int:
+        """Warm the cache from the database at startup. Returns rows loaded."""
+        if not self.persist:
+            return 0
+        # cursor first: a revocation logged while loading is applied on the next poll
+        self._rev_cursor = session_repo.latest_revocation_id()
+        rows = session_repo.load_active(int(time.time()))
+        with self._lock:
+            for jti, username, exp in rows:
+                if jti not in self._by_jti:
+                    self._cache(jti, username, exp)
+        self._ensure_flusher()
+        return len(rows)
+
+    def poll_revocations(self) -> int:
+        """Apply revocations logged by any worker since the last poll. Returns entries applied."""
+        if not self.persist:
+            return 0
+        if self._rev_cursor is None:
+            self._rev_cursor = session_repo.latest_revocation_id()
+            return 0
+        rows = session_repo.revocations_since(self._rev_cursor)
+        if not rows:
+            return 0
+        written_late: List[str] = []
+        with self._lock:
+            for _id, jti, username, at in rows:
+                if jti is not None:
+                    self._drop(jti)
+                    self._pending.pop(jti, None)
+                    continue
+                for j in list(self._by_user.get(username, ())):
+                    saved = self._saved_at.get(j)
+                    if saved is None:
+                        self._drop(j)  # read-through entry: the table decides on the next lookup
+                    elif saved <= at:
+                        # ours, created before the user-wide revoke: it may have been
+                        # written after the other worker's delete, so delete it again
+                        self._drop(j)
+                        if self._pending.pop(j, None) is None:
+                            written_late.append(j)
+            self._rev_cursor = rows[-1][0]
+            self._maybe_compact()
+            REFRESH_SESSIONS.set(len(self._by_jti))
+        if written_late:
+            with self._flush_lock:
+                session_repo.delete_jtis(written_late, log=False)
+        return len(rows)
+
+    def flush(self) -> int:
+        """Write buffered new sessions in one transaction. Returns rows written."""
+        if not self.persist:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                session_repo.insert_many((j, u, e) for j, (u, e) in batch.items())
+            except Exception as e:
+                log.error("refresh_session_flush_failed", count=len(batch), error=str(e))
+                with self._lock:
+                    # keep them for the next attempt, minus anything revoked meanwhile
+                    for jti, rec in batch.items():
+                        if jti in self._by_jti:
+                            self._pending.setdefault(jti, rec)
+                raise
+            return len(batch)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_every_s + 1)
+        self.flush()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="refresh-session-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_every_s):
+            try:
+                self.flush()
+            except Exception as e:
+                # the batch went back to _pending; retried on the next tick
+                log.warning("refresh_session_flush_retry", error=str(e))
+            try:
+                self.poll_revocations()
+            except Exception as e:
+                log.warning("refresh_revocation_poll_failed", error=str(e))
+
+    # ---- reads ----
+    def get(self, jti: str) -> Tuple[str, int] | None:
+        return self._by_jti.get(jti)
+
+    def is_active(self, jti: str) -> bool:
+        rec = self._by_jti.get(jti)
+        if not rec and self.persist:
+            rec = self._read_through(jti)
+        if not rec:
+            return False
+        username, exp = rec
+        return int(time.time()) < exp
+
+    def _read_through(self, jti: str) -> Tuple[str, int] | None:
+        # Miss: the session may have been created by another worker. The jti
+        # comes from a signature-checked refresh token, so misses can't be spammed.
+        rec = session_repo.get(jti)
+        if rec is None or rec[1] <= int(time.time()):
+            return None
+        with self._lock:
+            if jti not in self._by_jti:
+                self._cache(jti, rec[0], rec[1])
+        return rec
+
+    def sessions_of(self, username: str) -> Set[str]:
+        return set(self._by_user.get(username, ()))
+
+    def __len__(self) -> int:
+        return len(self._by_jti)
+
+    # ---- expiry ----
+    def sweep(self, now: int | None = None) -> int:
+        """Drop every expired session. Returns how many were removed."""
+        start = time.perf_counter()
+        now = int(time.time()) if now is None else now
+        removed = 0
+        with self._lock:
+            heap = self._expiry
+            while heap and heap[0][0] <= now:
+                exp, jti = heapq.heappop(heap)
+                rec = self._by_jti.get(jti)
+                if rec is not None and rec[1] == exp:
+                    self._drop(jti)
+                    removed += 1
+            self._next_sweep = time.time() + self.sweep_every_s
+            REFRESH_SESSIONS.set(len(self._by_jti))
+        if self.persist:
+            try:
+                with self._flush_lock:
+                    session_repo.delete_expired(now)
+                    session_repo.prune_revocations(time.time() - _REVOCATION_LOG_KEEP_S)
+            except Exception as e:
+                # runs inline on logins: never fail one over housekeeping
+                log.warning("refresh_session_sweep_failed", error=str(e))
+        REFRESH_SWEEP_DURATION.observe(time.perf_counter() - start)
+        return removed
+
+    def clear(self) -> None:
+        """Forget the in-memory cache (the database is left alone)."""
+        with self._lock:
+            self._by_jti.clear()
+            self._by_user.clear()
+            self._expiry.clear()
+            self._saved_at.clear()
+            REFRESH_SESSIONS.set(0)
+
+    # caller holds the lock
+    def _cache(self, jti: str, username: str, exp_epoch: int) -> None:
+        self._by_jti[jti] = (username, exp_epoch)
+        self._by_user.setdefault(username, set()).add(jti)
+        heapq.heappush(self._expiry, (exp_epoch, jti))
+        REFRESH_SESSIONS.set(len(self._by_jti))
+
+    def _drop(self, jti: str) -> None:
+        self._saved_at.pop(jti, None)
+        rec = self._by_jti.pop(jti, None)
+        if rec is None:
+            return
+        jtis = self._by_user.get(rec[0])
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._by_user[rec[0]]
+
+    def _maybe_compact(self) -> None:
+        if len(self._expiry) > 64 and len(self._expiry) > 2 * len(self._by_jti):
+            self._expiry = [(exp, jti) for jti, (_u, exp) in self._by_jti.items()]
+            heapq.heapify(self._expiry)
+
+# the one store for the whole app (app.security.security re-exports it)
+_REFRESH_STORE = RefreshSessionStore(persist=SESSION_PERSIST)
+# don't lose buffered sessions on a clean shutdown
+atexit.register(_REFRESH_STORE.close)
 
 def save_refresh(jti: str, username: str, exp_epoch: int) -> None:
-    _REFRESH_STORE[jti] = (username, exp_epoch)
+    _REFRESH_STORE.save(jti, username, exp_epoch)
 
 def revoke_refresh(jti: str) -> None:
-    _REFRESH_STORE.pop(jti, None)
+    _REFRESH_STORE.revoke(jti)
+
+def revoke_user_sessions(username: str) -> int:
+    return _REFRESH_STORE.revoke_user(username)
 
 def is_refresh_active(jti: str) -> bool:
-    rec = _REFRESH_STORE.get(jti)
-    if not rec:
-        return False
-    username, exp = rec
-    return int(time.time()) < exp
+    return _REFRESH_STORE.is_active(jti)
+
+def sweep_expired_sessions() -> int:
+    return _REFRESH_STORE.sweep()
+
+def load_refresh_sessions() -> int:
+    return _REFRESH_STORE.load()
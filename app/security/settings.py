@@ -11,14 +11,59 @@ ALLOWED_ORIGINS: list[str] = [o.strip() for o in _frontends if o.strip()]
 APP_ENV: str = os.getenv("APP_ENV", "dev").lower()
 STRICT_SECRETS: bool = os.getenv("STRICT_SECRETS", "false").lower() in ("1","true","yes")
 BODY_MAX_BYTES: int = int(os.getenv("BODY_MAX_BYTES", "1048576"))  # 1MB default
+# Per-route body caps: "/prefix=bytes,/other=bytes" (longest prefix wins)
+_body_overrides = os.getenv("BODY_MAX_BYTES_OVERRIDES", "").split(",")
+BODY_MAX_BYTES_OVERRIDES: dict[str, int] = {
+    k.strip(): int(v) for k, _, v in (o.partition("=") for o in _body_overrides) if k.strip() and v.strip().isdigit()
+}
 RATE_LIMIT_LOGIN_MAX: int = int(os.getenv("RATE_LIMIT_LOGIN_MAX", "5"))
 RATE_LIMIT_LOGIN_WINDOW: int = int(os.getenv("RATE_LIMIT_LOGIN_WINDOW", "60"))  # seconds
+# "memory" (per worker) or "sqlite" (shared by all workers on one host)
+RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_SQLITE_PATH: str = os.getenv("RATE_LIMIT_SQLITE_PATH", "./ratelimit.db")
+
+# DB connection pool (per worker, per engine): steady size, burst overflow, wait before 503-ing
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # seconds; -1 never
+SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# POST /applications/import (NDJSON): rows per insert transaction, body cap, error lines before aborting
+APPS_IMPORT_BATCH: int = max(1, int(os.getenv("APPS_IMPORT_BATCH", "500")))
+APPS_IMPORT_MAX_BYTES: int = int(os.getenv("APPS_IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+APPS_IMPORT_MAX_ERRORS: int = int(os.getenv("APPS_IMPORT_MAX_ERRORS", "1000"))
+# GET /applications/export: rows fetched per server-side cursor round trip (and per response chunk)
+APPS_EXPORT_YIELD_PER: int = max(1, int(os.getenv("APPS_EXPORT_YIELD_PER", "1000")))
+
+# Prometheus multiprocess mode (uvicorn/gunicorn workers): shared, writable dir, emptied before
+# each server start. Unset = per-process metrics. Dead workers' files are folded every N seconds.
+PROMETHEUS_MULTIPROC_DIR: str | None = os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+METRICS_REAP_SECONDS: float = float(os.getenv("METRICS_REAP_SECONDS", "30"))
+# Rendered /metrics is shared by scrapes within this many seconds (0 = render every scrape)
+METRICS_CACHE_SECONDS: float = float(os.getenv("METRICS_CACHE_SECONDS", "1"))
+METRICS_GZIP_LEVEL: int = int(os.getenv("METRICS_GZIP_LEVEL", "6"))
+
+# Argon2 runs on its own bounded pool; beyond workers + queue -> 503
+PASSWORD_HASH_WORKERS: int = max(1, int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))))
+PASSWORD_HASH_QUEUE: int = max(0, int(os.getenv("PASSWORD_HASH_QUEUE", "32")))
+PASSWORD_HASH_RETRY_AFTER: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))  # seconds
 
 # A07 settings
 JWT_ISSUER: str = os.getenv("JWT_ISSUER", "owasp-top10-starter")
 JWT_AUDIENCE: str = os.getenv("JWT_AUDIENCE", "owasp-top10-web")
 REFRESH_DAYS: int = int(os.getenv("REFRESH_DAYS", "7"))
 CLOCK_SKEW_SECONDS: int = int(os.getenv("CLOCK_SKEW_SECONDS", "60"))
+SESSION_SWEEP_SECONDS: int = int(os.getenv("SESSION_SWEEP_SECONDS", "60"))  # expired refresh sessions
+# Persist refresh sessions in DATABASE_URL (write-behind: batch size / max delay)
+SESSION_PERSIST: bool = os.getenv("SESSION_PERSIST", "true").lower() in ("1","true","yes")
+SESSION_FLUSH_BATCH: int = int(os.getenv("SESSION_FLUSH_BATCH", "100"))
+SESSION_FLUSH_SECONDS: float = float(os.getenv("SESSION_FLUSH_SECONDS", "1.0"))
+# Verified access-token LRU (0 disables the cache)
+TOKEN_CACHE_MAX: int = int(os.getenv("TOKEN_CACHE_MAX", "10000"))
+# User record cache in front of the users table (0 disables); TTL bounds staleness across workers
+USER_CACHE_MAX: int = int(os.getenv("USER_CACHE_MAX", "10000"))
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "30"))  # seconds
 
 # Cookie settings (dev safe defaults; tighten in prod)
 COOKIE_DOMAIN: str | None = os.getenv("COOKIE_DOMAIN") or None  # e.g. "yourdomain.com"
@@ -31,6 +76,42 @@ OUTBOUND_ALLOW_HOSTS: list[str] = [h.strip() for h in _out_hosts if h.strip()]
 # Block requests to private/internal IPs (RFC1918, loopback, link-local, etc.)
 OUTBOUND_BLOCK_PRIVATE: bool = os.getenv("OUTBOUND_BLOCK_PRIVATE", "true").lower() == "true"
 
+# Operator CIDR blocklist (comma list, IPv4/IPv6), applied on top of the private check
+_out_cidrs = os.getenv("OUTBOUND_BLOCK_CIDRS", "").split(",")
+OUTBOUND_BLOCK_CIDRS: list[str] = [c.strip() for c in _out_cidrs if c.strip()]
+
+# Outbound DNS cache (seconds; negative = "no records" answers) and size
+DNS_CACHE_TTL: float = float(os.getenv("DNS_CACHE_TTL", "30"))
+DNS_NEGATIVE_TTL: float = float(os.getenv("DNS_NEGATIVE_TTL", "5"))
+DNS_CACHE_MAX: int = int(os.getenv("DNS_CACHE_MAX", "4096"))
+
 # Allowed destination ports (comma list). Default http/https.
 _out_ports = os.getenv("OUTBOUND_ALLOWED_PORTS", "80,443").split(",")
-OUTBOUND_ALLOWED_PORTS: set[int] = {int(p) for p in _out_ports if p.strip().isdigit()}
\ No newline at end of file
+OUTBOUND_ALLOWED_PORTS: set[int] = {int(p) for p in _out_ports if p.strip().isdigit()}
+# Shared outbound HTTP client (created in the app lifespan)
+OUTBOUND_MAX_CONNECTIONS: int = int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "100"))
+OUTBOUND_MAX_KEEPALIVE: int = int(os.getenv("OUTBOUND_MAX_KEEPALIVE", "20"))
+OUTBOUND_KEEPALIVE_EXPIRY: float = float(os.getenv("OUTBOUND_KEEPALIVE_EXPIRY", "30"))  # seconds
+OUTBOUND_HTTP2: bool = os.getenv("OUTBOUND_HTTP2", "true").lower() == "true"  # used only if `h2` is installed
+OUTBOUND_MAX_REDIRECTS: int = int(os.getenv("OUTBOUND_MAX_REDIRECTS", "3"))  # each hop re-validated
+OUTBOUND_CONNECT_TIMEOUT: float = float(os.getenv("OUTBOUND_CONNECT_TIMEOUT", "3"))  # seconds
+OUTBOUND_TOTAL_TIMEOUT: float = float(os.getenv("OUTBOUND_TOTAL_TIMEOUT", "10"))  # whole fetch, all hops
+OUTBOUND_MAX_RESPONSE_BYTES: int = int(os.getenv("OUTBOUND_MAX_RESPONSE_BYTES", str(10 * 1024 * 1024)))
+
+# POST /fetch/batch: max URLs per call, concurrent fetches, concurrent per host
+FETCH_BATCH_MAX_URLS: int = int(os.getenv("FETCH_BATCH_MAX_URLS", "100"))
+FETCH_BATCH_CONCURRENCY: int = int(os.getenv("FETCH_BATCH_CONCURRENCY", "16"))
+FETCH_BATCH_PER_HOST: int = int(os.getenv("FETCH_BATCH_PER_HOST", "4"))
+# ... and batches per client IP per window (each batch is up to MAX_URLS outbound fetches)
+FETCH_BATCH_RATE_MAX: int = int(os.getenv("FETCH_BATCH_RATE_MAX", "10"))
+FETCH_BATCH_RATE_WINDOW: int = int(os.getenv("FETCH_BATCH_RATE_WINDOW", "60"))  # seconds
+
+# Integrity manifest: hashing threads, verified-stat cache file (relative to
+# the repo root; "" disables) and forced full re-hash period (seconds)
+INTEGRITY_WORKERS: int = int(os.getenv("INTEGRITY_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+INTEGRITY_CACHE: str = os.getenv("INTEGRITY_CACHE", ".integrity-cache.json")
+INTEGRITY_FULL_RECHECK_SECONDS: int = int(os.getenv("INTEGRITY_FULL_RECHECK_SECONDS", "86400"))
+# Background re-verification while running: seconds between passes (0 disables)
+# and the share of one core it may spend hashing (0.1 = 10%)
+INTEGRITY_MONITOR_SECONDS: float = float(os.getenv("INTEGRITY_MONITOR_SECONDS", "60"))
+INTEGRITY_MONITOR_CPU_BUDGET: float = float(os.getenv("INTEGRITY_MONITOR_CPU_BUDGET", "0.1"))
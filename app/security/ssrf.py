@@ -2,43 +2,67 @@
 from __future__ import annotations
 import ipaddress
 import socket
-from urllib.parse import urlparse
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.parse import urljoin, urlparse
 from typing import Iterable
 
+import anyio
 import httpx
 from fastapi import HTTPException, status
 
+try:
+    import h2  # noqa: F401  (optional: enables HTTP/2 on the shared client)
+except Exception:
+    h2 = None
+
+from app.security.observability import OUTBOUND_IN_FLIGHT, OUTBOUND_POOL_CONNECTIONS
+from app.security.netmatch import CidrIndex, HostMatcher
+from app.security.resolver import RESOLVER
 from app.security.settings import (
     OUTBOUND_ALLOW_HOSTS,
     OUTBOUND_BLOCK_PRIVATE,
+    OUTBOUND_BLOCK_CIDRS,
     OUTBOUND_ALLOWED_PORTS,
+    OUTBOUND_MAX_CONNECTIONS,
+    OUTBOUND_MAX_KEEPALIVE,
+    OUTBOUND_KEEPALIVE_EXPIRY,
+    OUTBOUND_HTTP2,
+    OUTBOUND_MAX_REDIRECTS,
+    OUTBOUND_CONNECT_TIMEOUT,
+    OUTBOUND_TOTAL_TIMEOUT,
+    OUTBOUND_MAX_RESPONSE_BYTES,
 )
 
 SAFE_SCHEMES = {"http", "https"}
 
-def _host_is_allowed(host: str, allow: Iterable[str]) -> bool:
+# Compiled once from settings (thousands of entries stay cheap to match)
+_ALLOW_MATCHER = HostMatcher(OUTBOUND_ALLOW_HOSTS)
+_BLOCKED_CIDRS = CidrIndex(OUTBOUND_BLOCK_CIDRS)
+
+def _host_is_allowed(host: str, allow: HostMatcher | Iterable[str]) -> bool:
+    if not isinstance(allow, HostMatcher):
+        allow = HostMatcher(allow)
     if not allow:
         # If allow-list is empty, deny by default (safer)
         return False
-    host = host.lower()
-    for entry in allow:
-        e = entry.lower()
-        if host == e:
-            return True
-        if e.startswith(".") and host.endswith(e):
-            return True
-    return False
-
-def _addr_is_private(addr: str) -> bool:
-    ip = ipaddress.ip_address(addr)
-    return any([
-        ip.is_private,
-        ip.is_loopback,
-        ip.is_link_local,
-        ip.is_reserved,
-        ip.is_multicast,
-        ip.is_unspecified,
-    ])
+    return allow.matches(host)
+
+def _addr_is_private(addr: str | ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    ip = ipaddress.ip_address(addr) if isinstance(addr, str) else addr
+    # short-circuits on the first hit; no per-call list
+    return (
+        ip.is_private
+        or ip.is_loopback
+        or ip.is_link_local
+        or ip.is_reserved
+        or ip.is_multicast
+        or ip.is_unspecified
+    )
+
+def _addr_is_blocked(ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    # operator CIDR blocklist; IPv4-mapped IPv6 is checked as its IPv4 address
+    mapped = getattr(ip, "ipv4_mapped", None)
+    return _BLOCKED_CIDRS.contains(ip) or (mapped is not None and _BLOCKED_CIDRS.contains(mapped))
 
 def _resolve_all(host: str) -> list[str]:
     # Get all A/AAAA records
@@ -52,10 +76,8 @@ def _resolve_all(host: str) -> list[str]:
             continue
     return list(dict.fromkeys(addrs))  # dedupe, preserve order
 
-def validate_outbound_url(raw_url: str) -> tuple[str, str, int]:
-    """
-    Returns (scheme, host, port) if ok; raises HTTPException otherwise.
-    """
+def _check_url(raw_url: str) -> tuple[str, str, int]:
+    # Everything that doesn't need DNS: scheme, port, host allow-list
     try:
         parsed = urlparse(raw_url)
     except Exception:
@@ -64,37 +86,192 @@ def validate_outbound_url(raw_url: str) -> tuple[str, str, int]:
     if parsed.scheme not in SAFE_SCHEMES:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Scheme not allowed")
 
-    host = parsed.hostname or ""
-    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Invalid URL")
     if port not in OUTBOUND_ALLOWED_PORTS:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Port not allowed")
 
-    if not _host_is_allowed(host, OUTBOUND_ALLOW_HOSTS):
+    if not _host_is_allowed(host, _ALLOW_MATCHER):
         raise HTTPException(status.HTTP_403_FORBIDDEN, "Host not on allow-list")
+    return parsed.scheme, host, port
 
-    # Resolve and verify all IPs
-    addrs = _resolve_all(host)
+def _check_addrs(addrs: list[str]) -> None:
     if not addrs:
         raise HTTPException(status.HTTP_502_BAD_GATEWAY, "DNS resolution failed")
 
-    if OUTBOUND_BLOCK_PRIVATE:
-        for addr in addrs:
-            if _addr_is_private(addr):
-                raise HTTPException(status.HTTP_403_FORBIDDEN, "Private address blocked")
+    for addr in addrs:
+        ip = ipaddress.ip_address(addr)
+        if OUTBOUND_BLOCK_PRIVATE and _addr_is_private(ip):
+            raise HTTPException(status.HTTP_403_FORBIDDEN, "Private address blocked")
+        if _addr_is_blocked(ip):
+            raise HTTPException(status.HTTP_403_FORBIDDEN, "Address blocked")
 
-    return parsed.scheme, host, port
+def validate_outbound_url(raw_url: str) -> tuple[str, str, int]:
+    """
+    Returns (scheme, host, port) if ok; raises HTTPException otherwise.
+    Blocking DNS: for sync callers. Async code should use
+    validate_outbound_url_async (cached, non-blocking, returns the IPs).
+    """
+    scheme, host, port = _check_url(raw_url)
+    _check_addrs(_resolve_all(host))
+    return scheme, host, port
 
-async def safe_http_get(url: str, timeout: float = 5.0) -> httpx.Response:
+async def validate_outbound_url_async(raw_url: str) -> tuple[str, str, int, list[str]]:
+    """
+    Same checks as validate_outbound_url, resolving through the shared
+    AsyncResolver. Returns (scheme, host, port, addrs); connect to addrs[0]
+    so the IP we checked is the IP we use (no second lookup, no rebinding).
+    """
+    scheme, host, port = _check_url(raw_url)
+    addrs = await RESOLVER.resolve(host)
+    _check_addrs(addrs)
+    return scheme, host, port, addrs
+
+def _pinned_request(
+    client: httpx.AsyncClient, url: str, addr: str, timeout: float, headers: dict[str, str] | None = None
+) -> httpx.Request:
+    # Send to the validated IP; keep Host header and TLS SNI/cert check on the name.
+    # Caveat: the pool keys connections by IP, so two allow-listed names on one
+    # IP may share a TLS connection.
+    u = httpx.URL(url)
+    return client.build_request(
+        "GET",
+        u.copy_with(host=addr),
+        headers={**(headers or {}), "Host": u.netloc.decode("ascii")},
+        extensions={"sni_hostname": u.raw_host.decode("ascii")},
+        timeout=timeout,
+    )
+
+# ---- Shared outbound client (one pool per process, owned by the app lifespan) ----
+_CLIENT: httpx.AsyncClient | None = None
+
+class _RejectAllCookies(DefaultCookiePolicy):
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+class _NoCookieJar(CookieJar):
+    """
+    The client is shared by every caller: a Set-Cookie from one upstream must
+    never ride along on someone else's fetch (requests go to the pinned IP,
+    so domain scoping wouldn't hold anyway).
+    """
+
+    def __init__(self):
+        super().__init__(policy=_RejectAllCookies())
+
+def _new_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=transport,     # tests only; None = pooled default transport
+        cookies=_NoCookieJar(),
+        follow_redirects=False,  # redirects are validated hop by hop below
+        http2=OUTBOUND_HTTP2 and h2 is not None,
+        limits=httpx.Limits(
+            max_connections=OUTBOUND_MAX_CONNECTIONS,
+            max_keepalive_connections=OUTBOUND_MAX_KEEPALIVE,
+            keepalive_expiry=OUTBOUND_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+async def start_http_client() -> None:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = _new_client()
+
+async def close_http_client() -> None:
+    global _CLIENT
+    client, _CLIENT = _CLIENT, None
+    if client is not None:
+        await client.aclose()
+    _publish_pool_gauges()
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared client; created on first use if the lifespan didn't run (scripts/tests)."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = _new_client()
+    return _CLIENT
+
+def _pool_connections(active: bool) -> int:
+    # httpcore pool introspection; 0 if there is no client or the internals differ
+    try:
+        conns = _CLIENT._transport._pool.connections  # type: ignore[union-attr]
+        return sum(1 for c in conns if c.is_idle() != active)
+    except Exception:
+        return 0
+
+def _publish_pool_gauges() -> None:
+    # pushed after each outbound request rather than computed at scrape time
+    # (set_function callbacks don't exist in Prometheus multiprocess mode)
+    OUTBOUND_POOL_CONNECTIONS.labels(state="active").set(_pool_connections(True))
+    OUTBOUND_POOL_CONNECTIONS.labels(state="idle").set(_pool_connections(False))
+
+async def safe_http_get(
+    url: str, timeout: float = 5.0, *, stream: bool = False, headers: dict[str, str] | None = None
+) -> httpx.Response:
     """
     Validate URL and perform a GET without following redirects automatically.
-    If a 3xx is returned with a Location header, we re-validate the target first.
+    Every 3xx Location is re-validated before it is requested (up to
+    OUTBOUND_MAX_REDIRECTS hops). Uses the shared pooled client and connects
+    to the IP that passed validation.
+
+    stream=True returns the final response with its body unread; the caller
+    must consume it (aiter_bytes) and `await resp.aclose()`. `headers` are
+    sent on every hop.
     """
-    validate_outbound_url(url)
-
-    async with httpx.AsyncClient(follow_redirects=False, timeout=timeout) as client:
-        resp = await client.get(url)
-        # Handle manual redirect validation (one hop is enough for demo)
-        if 300 <= resp.status_code < 400 and (loc := resp.headers.get("Location")):
-            validate_outbound_url(loc)
-            resp = await client.get(loc)
+    addrs = (await validate_outbound_url_async(url))[3]
+    client = get_http_client()
+    t = httpx.Timeout(timeout, connect=min(timeout, OUTBOUND_CONNECT_TIMEOUT))
+
+    OUTBOUND_IN_FLIGHT.inc()
+    try:
+        resp = await client.send(_pinned_request(client, url, addrs[0], t, headers), stream=stream)
+        for _ in range(OUTBOUND_MAX_REDIRECTS):
+            loc = resp.headers.get("Location")
+            if not (300 <= resp.status_code < 400 and loc):
+                break
+            await resp.aclose()
+            url = urljoin(url, loc)
+            addrs = (await validate_outbound_url_async(url))[3]
+            resp = await client.send(_pinned_request(client, url, addrs[0], t, headers), stream=stream)
         return resp
+    finally:
+        OUTBOUND_IN_FLIGHT.dec()
+        _publish_pool_gauges()
+
+async def safe_http_measure(
+    url: str,
+    timeout: float = 5.0,
+    max_bytes: int = OUTBOUND_MAX_RESPONSE_BYTES,
+    total_timeout: float = OUTBOUND_TOTAL_TIMEOUT,
+) -> tuple[int, int]:
+    """
+    Stream the response and return (status, body_length) without keeping
+    the body: memory stays at one chunk whatever the upstream size.
+    Aborts with 502 past `max_bytes` and 504 past `total_timeout` seconds
+    (validation + connect + headers + body, all hops included).
+
+    Asks for an uncompressed body and counts raw bytes as received, so a
+    server that compresses anyway can't expand a small gzip/br "bomb"
+    past `max_bytes` before the check runs.
+    """
+    try:
+        with anyio.fail_after(total_timeout):
+            resp = await safe_http_get(url, timeout=timeout, stream=True, headers={"Accept-Encoding": "identity"})
+            try:
+                length = 0
+                async for chunk in resp.aiter_raw():
+                    length += len(chunk)
+                    if length > max_bytes:
+                        raise HTTPException(status.HTTP_502_BAD_GATEWAY, "Upstream response too large")
+                return resp.status_code, length
+            finally:
+                await resp.aclose()
+                _publish_pool_gauges()
+    except TimeoutError:
+        raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, "Upstream fetch timed out")
@@ -0,0 +1,38 @@
+# app/security/token_cache.py
+from __future__ import annotations
+import hashlib
+import time
+from typing import Hashable, TypeVar
+
+from app.security.observability import record_token_cache
+from app.security.settings import TOKEN_CACHE_MAX
+from app.security.ttl_cache import TTLCache
+
+T = TypeVar("T")
+
+def token_digest(token: str) -> bytes:
+    # Never keep raw bearer tokens in memory longer than the request needs them.
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+class VerifiedTokenCache(TTLCache[str, T]):
+    """
+    Bounded LRU of already-verified tokens: digest -> (value, exp_epoch).
+    Entries die at the token's own `exp`, so a hit is never more permissive
+    than a fresh decode would be.
+    """
+
+    def __init__(self, max_entries: int):
+        super().__init__(max_entries, record=record_token_cache)
+
+    def _key(self, key: str) -> Hashable:
+        return token_digest(key)
+
+    def _now(self) -> float:
+        # `exp` is a wall-clock epoch
+        return int(time.time())
+
+ACCESS_TOKEN_CACHE: VerifiedTokenCache = VerifiedTokenCache(TOKEN_CACHE_MAX)
+
+def clear_token_cache() -> None:
+    """Drop all cached verifications. Use in tests or after a key rotation."""
+    ACCESS_TOKEN_CACHE.clear()
@@ -0,0 +1,77 @@
+# app/security/ttl_cache.py
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+def _no_record(event: str, n: int = 1) -> None:
+    pass
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded, thread-safe LRU whose entries carry their own expiry:
+    key -> (value, expires_at). Expired entries are dropped when read;
+    past `max_entries` the least recently used goes.
+
+    Subclasses may change how keys are stored (`_key`) and the clock that
+    `expires_at` is measured on (`_now`, monotonic by default). `record`
+    receives "hit" / "miss" / "eviction" / "invalidation" events.
+    """
+
+    def __init__(self, max_entries: int, record: Callable[..., None] = _no_record):
+        self.max = max(0, max_entries)
+        self.record = record
+        self._data: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, key: K) -> Hashable:
+        return key
+
+    def _now(self) -> float:
+        return time.monotonic()
+
+    def get(self, key: K) -> Optional[V]:
+        if not self.max:
+            return None
+        k = self._key(key)
+        now = self._now()
+        with self._lock:
+            rec = self._data.get(k)
+            if rec is not None and now < rec[1]:
+                self._data.move_to_end(k)
+                self.record("hit")
+                return rec[0]
+            if rec is not None:
+                del self._data[k]
+        self.record("miss")
+        return None
+
+    def put(self, key: K, value: V, expires_at: float) -> None:
+        if not self.max or expires_at <= self._now():
+            return
+        k = self._key(key)
+        evicted = 0
+        with self._lock:
+            self._data[k] = (value, expires_at)
+            self._data.move_to_end(k)
+            while len(self._data) > self.max:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.record("eviction", evicted)
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            if self._data.pop(self._key(key), None) is not None:
+                self.record("invalidation")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
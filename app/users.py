@@ -1,13 +1,18 @@
 # app/users.py
-from typing import Literal, Dict, Optional
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
-from passlib.hash import argon2
+from sqlalchemy.exc import IntegrityError
+from app.db import users as users_repo
+from app.security.observability import record_user_cache
+from app.security.pwhash import hash_password, verify_password
+from app.security.settings import USER_CACHE_MAX, USER_CACHE_TTL
+from app.security.ttl_cache import TTLCache
 
 Role = Literal["admin", "recruiter", "candidate"]
 
 class UserCreate(BaseModel):
     username: str
-    password: str 
+    password: str
     role: Literal["admin","recruiter","candidate"]
 
 class UserRecord(BaseModel):
@@ -15,25 +20,56 @@ class UserRecord(BaseModel):
     password_hash: str
     role: Role
 
-# in-memory store (lab only)
-USERS: Dict[str, UserRecord] = {}
+class UserCache(TTLCache[str, UserRecord]):
+    """
+    Bounded LRU of UserRecords with a short TTL, in front of the users table.
+    Writes in this worker invalidate explicitly; the TTL bounds how long
+    another worker's write can go unseen.
+    """
 
-def create_user(data: UserCreate) -> None:
-    if data.username in USERS:
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, record=record_user_cache)
+        self.ttl = ttl
+
+    def add(self, user: UserRecord) -> None:
+        if self.ttl > 0:
+            self.put(user.username, user, self._now() + self.ttl)
+
+USER_CACHE = UserCache(USER_CACHE_MAX, USER_CACHE_TTL)
+
+def clear_user_cache() -> None:
+    USER_CACHE.clear()
+
+async def create_user(data: UserCreate) -> None:
+    if await get_user(data.username):
+        raise ValueError("exists")  # cheap check before paying for Argon2
+    password_hash = await hash_password(data.password)
+    try:
+        # unique username: another signup may have won while we were hashing
+        await users_repo.insert_user(data.username, password_hash, data.role)
+    except IntegrityError:
         raise ValueError("exists")
-    USERS[data.username] = UserRecord(
-        username=data.username,
-        password_hash=argon2.hash(data.password),
-        role=data.role,
-    )
-
-def verify_user(username: str, password: str) -> Optional[UserRecord]:
-    u = USERS.get(username)
+    finally:
+        USER_CACHE.invalidate(data.username)
+
+async def verify_user(username: str, password: str) -> Optional[UserRecord]:
+    u = await get_user(username)
     if not u:
         return None
-    if not argon2.verify(password, u.password_hash):
+    if not await verify_password(password, u.password_hash):
+        return None
+    return u
+
+async def get_user(username: str) -> Optional[UserRecord]:
+    u = USER_CACHE.get(username)
+    if u is not None:
+        return u
+    row = await users_repo.get(username)
+    if row is None:
         return None
+    u = UserRecord(username=row[0], password_hash=row[1], role=row[2])
+    USER_CACHE.add(u)
     return u
 
-def get_user(username: str) -> Optional[UserRecord]:
-    return USERS.get(username)
+async def count_users() -> int:
+    return await users_repo.count()
@@ -1,11 +1,18 @@
 # tests/conftest.py
-import sys, pathlib
+import os, sys, pathlib, shutil, tempfile
 import pytest
 
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
+# Users live in the DB now: every session starts from an empty throwaway DB
+# (tests sign up fixed usernames), never the developer's dev.db.
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="owasp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DB_DIR, 'test.db')}"
+# tests assert on counters right after bumping them: no shared /metrics rendering
+os.environ["METRICS_CACHE_SECONDS"] = "0"
+
 from app.db.bootstrap import init_db
 from app.db.core import engine, Base
 from app.security.ratelimit import reset_rate_limits
@@ -14,10 +21,12 @@ from app.security.ratelimit import reset_rate_limits
 def _schema():
     init_db()                 # create tables once for the test session
     yield
-    # optional cleanup:
-    # Base.metadata.drop_all(bind=engine)
+    from app.security.session import _REFRESH_STORE
+    _REFRESH_STORE.close()    # flush write-behind sessions before the DB goes away
+    engine.dispose()
+    shutil.rmtree(_TEST_DB_DIR, ignore_errors=True)
 @pytest.fixture(autouse=True)
 def _reset_rl_between_tests():
-    reset_rate_limits("login:")
+    reset_rate_limits()
     yield
-    reset_rate_limits("login:")
\ No newline at end of file
+    reset_rate_limits()
\ No newline at end of file
@@ -4,6 +4,11 @@ from app.main import app
 
 client = TestClient(app)
 
+def bearer(username):
+    client.post("/signup", json={"username": username, "password": "Strong#123", "role": "candidate"})
+    t = client.post("/login", json={"username": username, "password": "Strong#123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {t}"}
+
 @pytest.mark.a10
 def test_block_localhost():
     r = client.get("/fetch", params={"url": "http://127.0.0.1/"})
@@ -18,3 +23,330 @@ def test_block_file_scheme():
 def test_block_link_local():
     r = client.get("/fetch", params={"url": "http://169.254.169.254/latest/meta-data/"})
     assert r.status_code in (400, 403)
+
+@pytest.mark.a10
+def test_shared_client_reused_and_redirect_hops_revalidated(monkeypatch):
+    import asyncio
+    import httpx
+    from fastapi import HTTPException
+    import app.security.ssrf as ssrf
+
+    checked = []
+    async def fake_validate(url):
+        checked.append(url)
+        if "internal" in url:
+            raise HTTPException(403, "Private address blocked")
+        return ("https", "partner.example.com", 443, ["93.184.216.34"])
+    monkeypatch.setattr(ssrf, "validate_outbound_url_async", fake_validate)
+
+    def handler(request: httpx.Request):
+        if request.url.path == "/hop":
+            return httpx.Response(302, headers={"Location": "/final"})
+        if request.url.path == "/evil":
+            return httpx.Response(302, headers={"Location": "http://internal.local/"})
+        return httpx.Response(200, content=b"done")
+
+    async def run():
+        await ssrf.close_http_client()
+        monkeypatch.setattr(ssrf, "_new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        await ssrf.start_http_client()
+        first = ssrf.get_http_client()
+        r = await ssrf.safe_http_get("https://partner.example.com/hop")
+        assert r.status_code == 200 and ssrf.get_http_client() is first
+        with pytest.raises(HTTPException):
+            await ssrf.safe_http_get("https://partner.example.com/evil")
+        await ssrf.close_http_client()
+
+    asyncio.run(run())
+    assert checked == [
+        "https://partner.example.com/hop", "https://partner.example.com/final",
+        "https://partner.example.com/evil", "http://internal.local/",
+    ]
+
+@pytest.mark.a10
+def test_async_resolver_ttl_negative_cache_and_singleflight():
+    import asyncio
+    from app.security.resolver import AsyncResolver
+
+    calls = []
+    async def stub(host):            # local stub resolver, no network
+        calls.append(host)
+        await asyncio.sleep(0.01)
+        return {"partner.example.com": ["93.184.216.34"]}.get(host, [])
+
+    async def run():
+        r = AsyncResolver(lookup=stub, ttl=60, negative_ttl=60)
+        # 20 concurrent lookups of one name -> one query
+        res = await asyncio.gather(*[r.resolve("Partner.Example.com") for _ in range(20)])
+        assert all(a == ["93.184.216.34"] for a in res)
+        assert await r.resolve("partner.example.com") == ["93.184.216.34"]   # cached
+        assert await r.resolve("nxdomain.example.com") == []
+        assert await r.resolve("nxdomain.example.com") == []                 # negative cache
+    asyncio.run(run())
+    assert calls == ["partner.example.com", "nxdomain.example.com"]
+
+@pytest.mark.a10
+def test_fetch_connects_to_validated_ip(monkeypatch):
+    import asyncio
+    import httpx
+    import app.security.ssrf as ssrf
+    from app.security.resolver import AsyncResolver
+
+    async def stub(host):
+        return ["93.184.216.34"]
+    monkeypatch.setattr(ssrf, "RESOLVER", AsyncResolver(lookup=stub))
+    monkeypatch.setattr(ssrf, "_ALLOW_MATCHER", ssrf.HostMatcher(["partner.example.com"]))
+
+    seen = []
+    def handler(request: httpx.Request):
+        seen.append((request.url.host, request.headers["host"], request.extensions.get("sni_hostname")))
+        return httpx.Response(200, content=b"ok")
+
+    async def run():
+        await ssrf.close_http_client()
+        monkeypatch.setattr(ssrf, "_new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        r = await ssrf.safe_http_get("https://partner.example.com/status")
+        assert r.status_code == 200
+        await ssrf.close_http_client()
+    asyncio.run(run())
+    assert seen == [("93.184.216.34", "partner.example.com", "partner.example.com")]
+
+@pytest.mark.a10
+def test_streaming_measure_caps_size_and_total_time(monkeypatch):
+    import asyncio
+    import httpx
+    from fastapi import HTTPException
+    import app.security.ssrf as ssrf
+
+    async def ok_validate(url):
+        return ("https", "partner.example.com", 443, ["93.184.216.34"])
+    monkeypatch.setattr(ssrf, "validate_outbound_url_async", ok_validate)
+
+    class Body(httpx.AsyncByteStream):
+        def __init__(self, chunks): self.chunks, self.sent = chunks, 0
+        async def __aiter__(self):
+            for _ in range(self.chunks):
+                self.sent += 1
+                yield b"x" * 4096
+
+    bodies = {}
+    async def handler(request: httpx.Request):
+        if request.url.path == "/slow":
+            await asyncio.sleep(5)
+        bodies[request.url.path] = Body(1000 if request.url.path == "/huge" else 3)
+        return httpx.Response(200, stream=bodies[request.url.path])
+
+    async def run():
+        await ssrf.close_http_client()
+        monkeypatch.setattr(ssrf, "_new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        assert await ssrf.safe_http_measure("https://partner.example.com/small") == (200, 3 * 4096)
+        with pytest.raises(HTTPException) as big:
+            await ssrf.safe_http_measure("https://partner.example.com/huge", max_bytes=64 * 1024)
+        assert big.value.status_code == 502
+        assert bodies["/huge"].sent < 20          # stopped early, not read to the end
+        with pytest.raises(HTTPException) as slow:
+            await ssrf.safe_http_measure("https://partner.example.com/slow", total_timeout=0.1)
+        assert slow.value.status_code == 504
+        await ssrf.close_http_client()
+    asyncio.run(run())
+
+@pytest.mark.a10
+def test_streaming_measure_does_not_decompress(monkeypatch):
+    import asyncio, gzip
+    import httpx
+    import app.security.ssrf as ssrf
+
+    async def ok_validate(url):
+        return ("https", "partner.example.com", 443, ["93.184.216.34"])
+    monkeypatch.setattr(ssrf, "validate_outbound_url_async", ok_validate)
+
+    bomb = gzip.compress(b"\0" * (8 * 1024 * 1024))   # ~8 KiB on the wire, 8 MiB decoded
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield bomb
+
+    seen = []
+    async def handler(request: httpx.Request):
+        seen.append(request.headers.get("Accept-Encoding"))
+        # a server that compresses even though identity was asked for
+        return httpx.Response(200, stream=Body(), headers={"Content-Encoding": "gzip"})
+
+    async def run():
+        await ssrf.close_http_client()
+        monkeypatch.setattr(ssrf, "_new_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        result = await ssrf.safe_http_measure("https://partner.example.com/bomb", max_bytes=64 * 1024)
+        await ssrf.close_http_client()
+        return result
+    assert asyncio.run(run()) == (200, len(bomb))   # counted as sent, never inflated
+    assert seen == ["identity"]
+
+@pytest.mark.a10
+def test_fetch_batch_validates_up_front_and_streams_concurrently(monkeypatch):
+    import asyncio, json, time
+    from fastapi import HTTPException
+    import app.routes_ssrf_demo as demo
+
+    async def fake_validate(url):
+        if "127.0.0.1" in url:
+            raise HTTPException(403, "Host not on allow-list")
+        host = url.split("/")[2]
+        return ("https", host, 443, ["93.184.216.34"])
+
+    active, peak = {}, {}
+    async def fake_measure(url):
+        host = url.split("/")[2]
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(0.2)
+        active[host] -= 1
+        return 200, len(url)
+
+    monkeypatch.setattr(demo, "validate_outbound_url_async", fake_validate)
+    monkeypatch.setattr(demo, "safe_http_measure", fake_measure)
+    monkeypatch.setattr(demo, "FETCH_BATCH_PER_HOST", 2)
+
+    urls = [f"https://a.example.com/{i}" for i in range(4)] + \
+           [f"https://b{i}.example.com/" for i in range(4)] + ["http://127.0.0.1/"]
+    hdr = bearer("batcher")
+    assert client.post("/fetch/batch", json={"urls": urls}).status_code in (401, 403)   # no anonymous fan-out
+    start = time.perf_counter()
+    r = client.post("/fetch/batch", json={"urls": urls}, headers=hdr)
+    elapsed = time.perf_counter() - start
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(l) for l in r.text.splitlines()]
+    assert lines[0] == {"url": "http://127.0.0.1/", "error": "Host not on allow-list", "code": 403}
+    assert sorted(l["url"] for l in lines[1:]) == sorted(urls[:-1])
+    assert peak["a.example.com"] == 2        # per-host cap held
+    assert elapsed < 0.2 * 8                 # not the sum of all fetches
+
+@pytest.mark.a10
+def test_compiled_host_matcher_and_cidr_index():
+    import ipaddress
+    from app.security.netmatch import CidrIndex, HostMatcher
+
+    m = HostMatcher(["Example.com", ".example.org", ".partners.net"])
+    assert m.matches("example.com") and m.matches("EXAMPLE.COM")
+    assert not m.matches("www.example.com")          # exact entry: no subdomains
+    assert m.matches("api.example.org") and m.matches("a.b.example.org")
+    assert not m.matches("example.org")              # suffix entry: subdomains only
+    assert not m.matches("evilexample.org") and not m.matches("example.org.evil.com")
+    assert not HostMatcher([])
+
+    idx = CidrIndex(["203.0.113.0/24", "203.0.113.128/25", "198.51.100.7/32", "2001:db8::/32"])
+    assert len(idx) == 3                              # overlapping ranges merged
+    ip = ipaddress.ip_address
+    assert idx.contains(ip("203.0.113.200")) and idx.contains(ip("198.51.100.7"))
+    assert not idx.contains(ip("198.51.100.8")) and not idx.contains(ip("8.8.8.8"))
+    assert idx.contains(ip("2001:db8::1")) and not idx.contains(ip("2001:db9::1"))
+
+@pytest.mark.a10
+def test_operator_cidr_blocklist_applies(monkeypatch):
+    from fastapi import HTTPException
+    import app.security.ssrf as ssrf
+    monkeypatch.setattr(ssrf, "_BLOCKED_CIDRS", ssrf.CidrIndex(["93.184.216.0/24"]))
+    with pytest.raises(HTTPException) as e:
+        ssrf._check_addrs(["93.184.216.34"])
+    assert e.value.status_code == 403
+    with pytest.raises(HTTPException):
+        ssrf._check_addrs(["::ffff:93.184.216.34"])   # IPv4-mapped form too
+    ssrf._check_addrs(["198.51.200.1"])               # public, not listed -> ok
+
+@pytest.mark.a10
+def test_shared_client_never_carries_cookies_between_fetches(monkeypatch):
+    import asyncio
+    import httpx
+    import app.security.ssrf as ssrf
+
+    async def ok_validate(url):
+        return ("https", url.split("/")[2], 443, ["93.184.216.34"])
+    monkeypatch.setattr(ssrf, "validate_outbound_url_async", ok_validate)
+
+    sent = []
+    def handler(request: httpx.Request):
+        sent.append(request.headers.get("cookie"))
+        return httpx.Response(200, headers={"Set-Cookie": "session=victim; Path=/"})
+
+    real_new_client = ssrf._new_client  # the production config, with a mock transport
+    async def run():
+        await ssrf.close_http_client()
+        monkeypatch.setattr(ssrf, "_new_client", lambda: real_new_client(httpx.MockTransport(handler)))
+        for url in ("https://a.example.com/", "https://b.example.com/", "https://a.example.com/"):
+            await ssrf.safe_http_get(url)
+        assert not ssrf.get_http_client().cookies
+        await ssrf.close_http_client()
+    asyncio.run(run())
+    assert sent == [None, None, None]
+
+@pytest.mark.a10
+def test_async_resolver_cancelled_caller_does_not_cancel_shared_lookup():
+    import asyncio
+    from app.security.resolver import AsyncResolver
+
+    cancelled = []
+    async def stub(host):
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return ["93.184.216.34"]
+
+    async def run():
+        r = AsyncResolver(lookup=stub, ttl=0)
+        gone = asyncio.create_task(r.resolve("partner.example.com"))
+        stays = asyncio.create_task(r.resolve("partner.example.com"))
+        await asyncio.sleep(0.01)
+        gone.cancel()                      # one client disconnects ...
+        assert await stays == ["93.184.216.34"]   # ... the other still gets its answer
+        assert gone.cancelled() and cancelled == []
+
+        alone = asyncio.create_task(r.resolve("other.example.com"))
+        await asyncio.sleep(0.01)
+        alone.cancel()                     # last waiter gone: the query is cancelled
+        await asyncio.gather(alone, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert cancelled == ["other.example.com"] and not r._inflight
+    asyncio.run(run())
+
+@pytest.mark.a10
+def test_fetch_batch_busy_host_does_not_hold_global_slots(monkeypatch):
+    import asyncio, time
+    import app.routes_ssrf_demo as demo
+
+    async def ok_validate(url):
+        return ("https", url.split("/")[2], 443, ["93.184.216.34"])
+
+    done_at = {}
+    async def fake_measure(url):
+        await asyncio.sleep(0.2)
+        done_at[url] = time.perf_counter()
+        return 200, 0
+
+    monkeypatch.setattr(demo, "validate_outbound_url_async", ok_validate)
+    monkeypatch.setattr(demo, "safe_http_measure", fake_measure)
+    monkeypatch.setattr(demo, "FETCH_BATCH_CONCURRENCY", 4)
+    monkeypatch.setattr(demo, "FETCH_BATCH_PER_HOST", 1)
+
+    # five URLs queued on host a (one at a time), then one on host b
+    urls = [f"https://a.example.com/{i}" for i in range(5)] + ["https://b.example.com/"]
+    hdr = bearer("hol_batcher")
+    start = time.perf_counter()
+    r = client.post("/fetch/batch", json={"urls": urls}, headers=hdr)
+    assert r.status_code == 200 and len(r.text.splitlines()) == 6
+    # b runs next to a's first fetch instead of waiting behind the a queue
+    assert done_at["https://b.example.com/"] - start < 0.35
+
+@pytest.mark.a10
+def test_fetch_batch_is_rate_limited(monkeypatch):
+    import app.routes_ssrf_demo as demo
+
+    async def deny(url):
+        from fastapi import HTTPException
+        raise HTTPException(403, "Host not on allow-list")
+    monkeypatch.setattr(demo, "validate_outbound_url_async", deny)
+    hdr = bearer("batch_limited")
+    codes = [client.post("/fetch/batch", json={"urls": ["http://127.0.0.1/"]}, headers=hdr).status_code
+             for _ in range(demo.FETCH_BATCH_RATE_MAX + 1)]
+    assert codes[:-1] == [200] * demo.FETCH_BATCH_RATE_MAX
+    assert codes[-1] == 429
@@ -28,3 +28,165 @@ def test_body_size_limit_returns_413():
     big = "A" * (BODY_MAX_BYTES + 100)
     r = client.post("/debug/echojson", json={"x": big})
     assert r.status_code == 413
+
+@pytest.mark.a04
+def test_password_hash_pool_full_returns_503(monkeypatch):
+    import threading
+    import app.security.pwhash as pwhash
+    signup("busy_user","Pass#123","candidate")
+    full = threading.BoundedSemaphore(1)
+    full.acquire()  # no free slot left
+    monkeypatch.setattr(pwhash, "_SLOTS", full)
+    r = client.post("/login", json={"username":"busy_user","password":"Pass#123"})
+    assert r.status_code == 503
+    assert r.headers.get("Retry-After") is not None
+    m = client.get("/metrics").text
+    assert "password_hash_queue_depth" in m
+    assert "password_hash_duration_seconds" in m
+    assert "password_hash_rejected_total 1.0" in m    # load shedding, not a client rate limit
+    assert 'rate_limit_hits_total{bucket="password_hash"}' not in m
+
+@pytest.mark.a04
+def test_chunked_body_over_limit_returns_413():
+    # no Content-Length: generator body is sent with Transfer-Encoding: chunked
+    def chunks():
+        for _ in range(BODY_MAX_BYTES // 65536 + 2):
+            yield b"A" * 65536
+    r = client.post("/debug/echojson", content=chunks(), headers={"Content-Type": "application/json"})
+    assert r.status_code == 413
+
+@pytest.mark.a04
+def test_body_limit_per_route_override():
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+    from fastapi.testclient import TestClient
+    from app.security.limits import BodySizeLimit
+
+    async def echo(request):
+        return PlainTextResponse(str(len(await request.body())))
+
+    inner = Starlette(routes=[Route("/json", echo, methods=["POST"]), Route("/uploads/x", echo, methods=["POST"])])
+    c = TestClient(BodySizeLimit(inner, max_body_bytes=10, overrides={"/uploads": 100}))
+    assert c.post("/json", content=b"x" * 11).status_code == 413
+    assert c.post("/uploads/x", content=b"x" * 50).text == "50"
+    assert c.post("/uploads/x", content=iter([b"x" * 60, b"x" * 60])).status_code == 413
+
+@pytest.mark.a04
+def test_rate_limit_retry_after_and_idle_eviction(monkeypatch):
+    import app.security.ratelimit as rl
+    now = [1000.0]
+    monkeypatch.setattr(rl.time, "monotonic", lambda: now[0])
+    rl.reset_rate_limits("t:")
+
+    for _ in range(5):
+        assert rl._allow("t:a", 5, 60)[0]
+    ok, retry = rl._allow("t:a", 5, 60)
+    assert not ok and retry == 60          # the whole burst has to age out
+    now[0] += 60
+    assert rl._allow("t:a", 5, 60)[0]
+
+    for i in range(20):
+        rl._allow(f"t:idle{i}", 5, 60)
+    now[0] += 61                           # everyone idle for a full window
+    for _ in range(rl._SWEEP_EVERY):       # at least one batched sweep runs
+        rl._allow("t:fresh", 5, 60)
+    assert [k for k in rl._BUCKETS if k.startswith("t:")] == ["t:fresh"]
+    rl.reset_rate_limits("t:")
+
+def _count_allowed(allow, clock, limit: int, window_s: int) -> tuple:
+    # one attempt per second for two windows; remember when each was allowed
+    allowed, denied = [], []
+    for _ in range(2 * window_s):
+        ok, retry = allow("t:steady", limit, window_s)
+        (allowed if ok else denied).append((clock[0], retry))
+        clock[0] += 1
+    return allowed, denied
+
+@pytest.mark.a04
+def test_rate_limit_never_exceeds_limit_per_window(monkeypatch, tmp_path):
+    import app.security.ratelimit as rl
+    from app.security.ratelimit_sqlite import SQLiteBackend
+    clock = [1000.0]
+    monkeypatch.setattr(rl.time, "monotonic", lambda: clock[0])
+    rl.reset_rate_limits("t:")
+    b = SQLiteBackend(str(tmp_path / "rl.db"))
+    monkeypatch.setattr("app.security.ratelimit_sqlite.time.time", lambda: clock[0])
+    try:
+        for allow in (rl._allow, b.allow):
+            clock[0] = 1000.0
+            allowed, denied = _count_allowed(allow, clock, 5, 60)
+            times = [t for t, _ in allowed]
+            assert times[:5] == [1000.0, 1001.0, 1002.0, 1003.0, 1004.0]
+            assert denied[0] == (1005.0, 55)     # exactly `limit`, then wait for the first to age out
+            assert all(sum(s <= t < s + 60 for t in times) <= 5 for s in times)
+            assert len(allowed) == 10
+    finally:
+        b.close()
+        rl.reset_rate_limits("t:")
+
+def _sqlite_worker(path: str) -> int:
+    # one "uvicorn worker": its own process and its own connection
+    from app.security.ratelimit_sqlite import SQLiteBackend
+    b = SQLiteBackend(path)
+    allowed = sum(b.allow("login:shared", 20, 60)[0] for _ in range(50))
+    b.close()
+    return allowed
+
+@pytest.mark.a04
+def test_sqlite_backend_limit_is_global_across_workers(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+    from app.security.ratelimit_sqlite import SQLiteBackend
+    path = str(tmp_path / "rl.db")
+    SQLiteBackend(path).close()  # create schema once
+    with ProcessPoolExecutor(max_workers=4) as ex:
+        allowed = sum(ex.map(_sqlite_worker, [path] * 4))
+    assert allowed == 20       # not 20 x workers
+
+    b = SQLiteBackend(path)
+    ok, retry = b.allow("login:shared", 20, 60)
+    assert not ok and retry >= 1
+    b.reset("login:")
+    assert b.allow("login:shared", 20, 60)[0]
+    b.close()
+
+@pytest.mark.a04
+def test_login_dep_uses_pluggable_backend(tmp_path):
+    import app.security.ratelimit as rl
+    from app.security.ratelimit_sqlite import SQLiteBackend
+    previous = rl.get_backend()
+    rl.set_backend(SQLiteBackend(str(tmp_path / "rl.db")))
+    try:
+        signup("rl_sql","Pass#123","candidate")
+        codes = [client.post("/login", json={"username":"rl_sql","password":"wrong"}).status_code
+                 for _ in range(RATE_LIMIT_LOGIN_MAX + 1)]
+        assert codes[-1] == 429
+    finally:
+        rl.get_backend().close()
+        rl.set_backend(previous)
+
+@pytest.mark.a04
+def test_password_hash_slot_held_until_job_finishes(monkeypatch):
+    import asyncio, threading
+    import app.security.pwhash as pwhash
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(pwhash, "_SLOTS", slots)
+    release = threading.Event()
+
+    def slow(_pw):
+        release.wait(5)
+        return "hash"
+
+    async def run():
+        t = asyncio.ensure_future(pwhash._run("hash", slow, "pw"))
+        await asyncio.sleep(0.05)
+        t.cancel()                          # client disconnected mid-hash
+        await asyncio.gather(t, return_exceptions=True)
+        assert not slots.acquire(blocking=False)   # Argon2 still running: slot still taken
+        release.set()
+        for _ in range(100):
+            if slots.acquire(blocking=False):
+                return True
+            await asyncio.sleep(0.01)
+        return False
+    assert asyncio.run(run())               # freed once the job itself finished
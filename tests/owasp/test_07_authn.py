@@ -43,3 +43,158 @@ def test_refresh_token_cannot_call_me():
     # using refresh as bearer must fail
     r2 = client.get("/me", headers={"Authorization": f"Bearer {rt}"})
     assert r2.status_code == 401
+
+@pytest.mark.a07
+def test_verified_token_cache_skips_decode(monkeypatch):
+    import app.security.auth as auth
+    from app.security.token_cache import clear_token_cache
+
+    signup("cachey","Strong#123","candidate")
+    r = login("cachey","Strong#123"); assert r.status_code == 200
+    hdr = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    clear_token_cache()
+    assert client.get("/me", headers=hdr).status_code == 200
+
+    # second call must be served from the cache, no JWT decode
+    def _boom(_t):
+        raise AssertionError("decode should not run on a cache hit")
+    monkeypatch.setattr(auth, "_decode_required", _boom)
+    r2 = client.get("/me", headers=hdr)
+    assert r2.status_code == 200
+    assert r2.json()["username"] == "cachey"
+
+@pytest.mark.a07
+def test_verified_token_cache_expiry_and_bound(monkeypatch):
+    import time
+    from app.security.token_cache import VerifiedTokenCache
+
+    c = VerifiedTokenCache(max_entries=2)
+    now = int(time.time())
+    c.put("a", "A", now + 60)
+    c.put("b", "B", now + 60)
+    c.put("c", "C", now + 60)          # evicts "a" (LRU)
+    assert c.get("a") is None and c.get("c") == "C"
+    assert len(c) == 2
+
+    c.put("gone", "G", now - 1)        # already expired -> never stored
+    assert c.get("gone") is None
+    c.put("soon", "S", now + 5)
+    monkeypatch.setattr(time, "time", lambda: now + 10)
+    assert c.get("soon") is None       # dies at the token's own exp
+
+@pytest.mark.a07
+def test_logout_all_revokes_every_session():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    signup("multidev","Strong#123","candidate")
+    phone, laptop = TestClient(app), TestClient(app)
+    access = phone.post("/login", json={"username":"multidev","password":"Strong#123"}).json()["access_token"]
+    assert laptop.post("/login", json={"username":"multidev","password":"Strong#123"}).status_code == 200
+
+    r = phone.post("/logout/all", headers={"Authorization": f"Bearer {access}"})
+    assert r.status_code == 200 and r.json()["revoked"] == 2
+    assert laptop.post("/refresh").status_code == 401
+
+@pytest.mark.a07
+def test_session_store_sweeps_expired_and_indexes_users():
+    from app.security.session import RefreshSessionStore
+    s = RefreshSessionStore()
+    s.save("j1", "u1", 100)
+    s.save("j2", "u1", 300)
+    s.save("j3", "u2", 200)
+    assert s.sessions_of("u1") == {"j1", "j2"}
+    assert s.sweep(now=250) == 2            # j1 and j3 expired
+    assert len(s) == 1 and s.sessions_of("u2") == set()
+    assert s.revoke_user("u1") == 1
+    assert len(s) == 0
+
+@pytest.mark.a07
+def test_refresh_sessions_survive_restart_and_revoke_is_durable():
+    import time
+    from app.db import refresh_sessions as repo
+    from app.security.session import RefreshSessionStore
+
+    exp = int(time.time()) + 3600
+    before = RefreshSessionStore(persist=True, flush_batch=10, flush_every_s=60)
+    before.load()
+    before.save("persist-jti-1", "durable", exp)
+    assert repo.get("persist-jti-1") is None      # buffered (write-behind)
+    assert before.flush() == 1
+    assert repo.get("persist-jti-1") == ("durable", exp)
+
+    after = RefreshSessionStore(persist=True, flush_every_s=60)   # "restarted" worker
+    assert after.load() >= 1
+    assert after.is_active("persist-jti-1")
+
+    after.revoke("persist-jti-1")                 # durable before returning
+    assert repo.get("persist-jti-1") is None
+    assert not RefreshSessionStore(persist=True).is_active("persist-jti-1")
+    # another worker keeps answering from memory until it polls the revocation log
+    assert before.is_active("persist-jti-1")
+    assert before.poll_revocations() == 1
+    assert not before.is_active("persist-jti-1") and before.sessions_of("durable") == set()
+
+    # logout-everywhere on one worker: counts what is stored (its own buffer
+    # flushed first) and reaches sessions another worker hasn't written yet
+    after.save("persist-jti-2", "durable", exp)   # buffered on `after`
+    before.save("persist-jti-3", "durable", exp)  # buffered on `before`
+    before.flush()
+    assert after.revoke_user("durable") == 2      # jti-2 (flushed first) + jti-3
+    assert before.poll_revocations() == 1
+    assert not before.is_active("persist-jti-3")
+    before.save("persist-jti-4", "durable", exp)  # a login after the revoke survives
+    after.poll_revocations(); before.poll_revocations()
+    assert before.is_active("persist-jti-4")
+    before.flush()
+    assert after.is_active("persist-jti-4")
+    before.close(); after.close()
+
+@pytest.mark.a07
+def test_users_are_db_backed_with_read_through_cache(monkeypatch):
+    import asyncio, time
+    import app.db.users as users_repo
+    from app.users import UserCache, UserRecord, clear_user_cache, get_user
+    from app.security.observability import USER_CACHE_EVENTS
+
+    assert signup("dbuser","Strong#123","recruiter").status_code == 200
+    assert signup("dbuser","Strong#123","recruiter").status_code == 400   # unique in the DB
+    clear_user_cache()                                  # as after a restart
+    assert login("dbuser","Strong#123").status_code == 200   # read from the DB, then cached
+
+    hits = USER_CACHE_EVENTS.labels(event="hit")._value.get()
+    async def _no_db(_u):
+        raise AssertionError("cached lookup must not reach the DB")
+    monkeypatch.setattr(users_repo, "get", _no_db)
+    u = asyncio.run(get_user("dbuser"))
+    assert u.role == "recruiter"
+    assert USER_CACHE_EVENTS.labels(event="hit")._value.get() == hits + 1
+    monkeypatch.undo()
+
+    # bounded, expires after the TTL, explicit invalidation
+    c = UserCache(max_entries=2, ttl=30)
+    for name in ("a", "b", "c"):
+        c.add(UserRecord(username=name, password_hash="h", role="candidate"))
+    assert c.get("a") is None and c.get("c") is not None and len(c) == 2
+    c.invalidate("c")
+    assert c.get("c") is None
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 31)
+    assert c.get("b") is None
+
+@pytest.mark.a07
+def test_refresh_session_db_errors_never_fail_a_login(monkeypatch):
+    import time
+    from app.db import refresh_sessions as repo
+    from app.security.session import RefreshSessionStore
+
+    def down(*_a, **_k):
+        raise RuntimeError("db down")
+    s = RefreshSessionStore(persist=True, flush_batch=1, flush_every_s=60)
+    monkeypatch.setattr(repo, "insert_many", down)
+    monkeypatch.setattr(repo, "delete_expired", down)
+    s._next_sweep = 0                             # inline flush and sweep both hit the DB
+    s.save("flaky-jti", "flaky", int(time.time()) + 3600)
+    assert s.is_active("flaky-jti") and "flaky-jti" in s._pending   # kept for the flusher
+    monkeypatch.undo()
+    assert s.flush() == 1 and repo.get("flaky-jti") is not None
+    s.close()
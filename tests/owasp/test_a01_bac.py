@@ -39,3 +39,103 @@ def test_admin_only_and_anti_idor():
     assert auth_get(t_cyrine, f"/applications/{app_id}").status_code == 200
     assert auth_get(t_ahmed,  f"/applications/{app_id}").status_code == 403
     assert auth_get(t_admin,  f"/applications/{app_id}").status_code == 200
+
+@pytest.mark.a01
+def test_applications_keyset_pagination_owner_and_admin():
+    assert signup("pager_a","Strong#123","candidate").status_code == 200
+    assert signup("pager_b","Strong#123","candidate").status_code == 200
+    assert signup("pager_admin","Strong#123","admin").status_code == 200
+    t_a, t_b = login("pager_a","Strong#123"), login("pager_b","Strong#123")
+    t_admin = login("pager_admin","Strong#123")
+
+    mine = [auth_post(t_a, "/applications", {"title": f"A{i}", "description": "own row"}).json()["id"] for i in range(5)]
+    theirs = auth_post(t_b, "/applications", {"title": "B0", "description": "other row"}).json()["id"]
+
+    def walk(token, limit):
+        seen, url = [], f"/applications?limit={limit}"   # first page: no cursor
+        while True:
+            page = auth_get(token, url).json()
+            assert len(page["items"]) <= limit
+            seen += page["items"]
+            if page["next_cursor"] is None:
+                return seen
+            url = f"/applications?limit={limit}&cursor={page['next_cursor']}"
+
+    own = walk(t_a, 2)
+    assert all(it["owner"] == "pager_a" for it in own)
+    assert [it["id"] for it in own] == mine               # every own row, in order, no dupes
+
+    ids = [it["id"] for it in walk(t_admin, 50)]
+    assert ids == sorted(set(ids))
+    assert set(mine) | {theirs} <= set(ids)              # admin sees everyone's
+    assert auth_get(t_a, "/applications?limit=0").status_code == 422
+
+@pytest.mark.a01
+def test_bulk_import_streams_per_line_errors_and_batches(monkeypatch):
+    import json
+    import app.routes_apps as routes_apps
+    monkeypatch.setattr(routes_apps, "APPS_IMPORT_BATCH", 3)
+    assert signup("importer","Strong#123","recruiter").status_code == 200
+    t = login("importer","Strong#123")
+    hdr = {"Authorization": f"Bearer {t}", "Content-Type": "application/x-ndjson"}
+
+    lines = [json.dumps({"title": f"Role {i}", "description": "bulk row"}) for i in range(7)]
+    lines.insert(2, "{not json")
+    lines.insert(5, json.dumps({"title": "x", "description": "too short title"}))
+    lines.append("")                                      # blank lines are ignored
+    lines.append("x" * (routes_apps._MAX_LINE_BYTES + 10))  # overlong: rejected unread
+
+    def chunks():                                          # chunked upload, lines split across chunks
+        body = "\n".join(lines).encode()
+        for i in range(0, len(body), 37):
+            yield body[i:i + 37]
+
+    r = client.post("/applications/import", content=chunks(), headers=hdr)
+    assert r.status_code == 200
+    out = [json.loads(l) for l in r.text.splitlines()]
+    assert [o["line"] for o in out[:-1]] == [3, 6, 11]
+    assert out[-1] == {"imported": 7, "errors": 3}
+
+    page = auth_get(t, "/applications?limit=200").json()
+    assert [it["title"] for it in page["items"]] == [f"Role {i}" for i in range(7)]
+
+    # body cap still applies to the streamed upload: the response has already
+    # started, so the 413 from BodySizeLimit ends the stream as an "aborted" summary
+    from app.main import app as asgi_app
+    from app.security.limits import BodySizeLimit
+    mw = next(m for m in asgi_app.user_middleware if m.cls is BodySizeLimit)
+    monkeypatch.setitem(mw.kwargs["overrides"], "/applications/import", 100)
+    asgi_app.middleware_stack = None                      # rebuild with the patched cap
+    try:
+        r = client.post("/applications/import", content=chunks(), headers=hdr)
+        assert r.status_code == 200
+        assert json.loads(r.text) == {"imported": 0, "errors": 0, "aborted": "Request body too large"}
+    finally:
+        monkeypatch.undo()
+        asgi_app.middleware_stack = None
+
+@pytest.mark.a01
+def test_export_streams_ndjson_and_csv_with_sql_side_filtering(monkeypatch):
+    import csv, io, json
+    import app.routes_apps as routes_apps
+    monkeypatch.setattr(routes_apps, "APPS_EXPORT_YIELD_PER", 2)   # several cursor batches
+    assert signup("exporter","Strong#123","candidate").status_code == 200
+    assert signup("export_admin","Strong#123","admin").status_code == 200
+    t, t_admin = login("exporter","Strong#123"), login("export_admin","Strong#123")
+    ids = [auth_post(t, "/applications", {"title": f"Exp {i}", "description": "=HYPERLINK(\"x\")"}).json()["id"]
+           for i in range(5)]
+
+    r = auth_get(t, "/applications/export")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(l) for l in r.text.splitlines()]
+    assert [x["id"] for x in rows] == ids                  # only the caller's rows, in order
+    assert {x["owner"] for x in rows} == {"exporter"}
+
+    r = auth_get(t_admin, "/applications/export?format=csv")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/csv")
+    table = list(csv.DictReader(io.StringIO(r.text)))
+    assert set(map(str, ids)) <= {row["id"] for row in table}   # admin: everyone's rows
+    assert any(row["owner"] != "exporter" for row in table)
+    mine = [row for row in table if row["owner"] == "exporter"]
+    assert mine[0]["description"].startswith("'=")          # formula injection neutralised
+    assert auth_get(t, "/applications/export?format=xml").status_code == 422
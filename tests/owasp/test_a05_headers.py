@@ -11,3 +11,16 @@ def test_security_headers_present_on_health():
     assert h.get("X-Frame-Options") == "DENY"
     assert h.get("X-Content-Type-Options") == "nosniff"
     assert h.get("Referrer-Policy") == "no-referrer"
+
+@pytest.mark.a05
+def test_fused_middleware_headers_request_id_and_docs_csp():
+    c = TestClient(app)
+    r = c.get("/health")
+    assert r.headers.get("Strict-Transport-Security", "").startswith("max-age=")
+    assert r.headers.get("x-request-id")
+    assert "cdn.jsdelivr.net" not in r.headers["content-security-policy"]
+    # 413 from the inner body limit still gets the headers
+    assert c.post("/debug/echojson", content=b"x", headers={"content-length": "999999999"}).headers.get("X-Frame-Options") == "DENY"
+    d = c.get("/docs")
+    assert "cdn.jsdelivr.net" in d.headers["content-security-policy"]
+    assert len(d.headers.get_list("content-security-policy")) == 1
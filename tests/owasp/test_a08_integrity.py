@@ -30,3 +30,148 @@ def test_integrity_detects_tamper_and_restore():
     # verify OK again after restore
     problems = verify_checksums(str(manifest), strict=False)
     assert problems == []
+
+def test_integrity_parallel_manifest_with_crlf_fallback(tmp_path):
+    """Many entries hashed concurrently; CRLF-only differences still pass."""
+    import hashlib, json
+    entries = []
+    for i in range(20):
+        lf = f"line {i}\nsecond\n".encode()
+        f = tmp_path / f"f{i}.txt"
+        f.write_bytes(lf.replace(b"\n", b"\r\n") if i % 2 else lf)  # odd: checked out with CRLF
+        entries.append({"path": str(f), "sha256": hashlib.sha256(lf).hexdigest(), "bytes": len(lf)})
+    (tmp_path / "f7.txt").write_bytes(b"tampered\r\n")
+    manifest = tmp_path / "m.json"
+    manifest.write_text(json.dumps({"files": entries}), encoding="utf-8")
+
+    problems = verify_checksums(str(manifest), strict=False)
+    assert {p["path"] for p in problems} == {str(tmp_path / "f7.txt")}
+    assert any(p["error"] == "sha256 mismatch" for p in problems)
+
+def test_integrity_cache_skips_unchanged_and_rejects_forgery(tmp_path, monkeypatch):
+    """Unchanged files aren't re-hashed; a forged cache or a changed file is."""
+    import hashlib, json
+    import app.security.integrety as integ
+
+    asset = tmp_path / "a.txt"
+    asset.write_bytes(b"hello\n")
+    manifest = tmp_path / "m.json"
+    manifest.write_text(json.dumps({"files": [
+        {"path": str(asset), "sha256": hashlib.sha256(b"hello\n").hexdigest(), "bytes": 6},
+    ]}), encoding="utf-8")
+    cache = tmp_path / "cache.json"
+
+    assert verify_checksums(str(manifest), strict=False, cache_path=str(cache)) == []
+    hashed = []
+    real = integ.sha256_with_crlf_fallback
+    monkeypatch.setattr(integ, "sha256_with_crlf_fallback", lambda p: hashed.append(p) or real(p))
+
+    assert verify_checksums(str(manifest), strict=False, cache_path=str(cache)) == []
+    assert hashed == []                                   # stat matched: skipped
+
+    # forged cache (claims a different stat) -> MAC fails -> full re-hash
+    data = json.loads(cache.read_text())
+    data["body"]["entries"][str(asset)]["stat"][0] = 999
+    cache.write_text(json.dumps(data))
+    assert verify_checksums(str(manifest), strict=False, cache_path=str(cache)) == []
+    assert hashed == [str(asset)]
+
+    # content changed -> stat differs -> re-hashed and caught
+    asset.write_bytes(b"HELLO\n")
+    problems = verify_checksums(str(manifest), strict=False, cache_path=str(cache))
+    assert problems and problems[0]["error"] == "sha256 mismatch"
+
+    # scheduled full re-hash ignores a valid cache
+    asset.write_bytes(b"hello\n")
+    verify_checksums(str(manifest), strict=False, cache_path=str(cache))
+    hashed.clear()
+    monkeypatch.setattr(integ, "INTEGRITY_FULL_RECHECK_SECONDS", 0)
+    verify_checksums(str(manifest), strict=False, cache_path=str(cache))
+    assert hashed == [str(asset)]
+
+def test_integrity_monitor_rehashes_only_changed_files(tmp_path, monkeypatch):
+    """Background passes stat everything but hash only what changed; metrics track state."""
+    import asyncio, hashlib, json
+    import app.security.integrety as integ
+    from app.security.integrity_monitor import IntegrityMonitor
+    from app.security.observability import INTEGRITY_LAST_CHECK, INTEGRITY_MISMATCHES
+
+    files = []
+    for i in range(5):
+        f = tmp_path / f"f{i}.txt"
+        f.write_bytes(f"asset {i}\n".encode())
+        files.append({"path": str(f), "sha256": hashlib.sha256(f.read_bytes()).hexdigest(), "bytes": f.stat().st_size})
+    manifest = tmp_path / "m.json"
+    manifest.write_text(json.dumps({"files": files}), encoding="utf-8")
+
+    hashed = []
+    real = integ.sha256_with_crlf_fallback
+    monkeypatch.setattr(integ, "sha256_with_crlf_fallback", lambda p: hashed.append(p) or real(p))
+    mon = IntegrityMonitor(str(manifest), cpu_budget=1.0)
+
+    assert mon.check_once() == [] and len(hashed) == 5     # first pass: everything
+    hashed.clear()
+    assert mon.check_once() == [] and hashed == []         # nothing changed: stat only
+
+    (tmp_path / "f3.txt").write_bytes(b"tampered!\n")
+    problems = mon.check_once()
+    assert {p["path"] for p in problems} == {str(tmp_path / "f3.txt")}
+    assert hashed == [str(tmp_path / "f3.txt")]
+    assert INTEGRITY_MISMATCHES._value.get() == 1
+    hashed.clear()
+    assert mon.check_once() == problems and hashed == []   # same broken file: not re-hashed
+
+    (tmp_path / "f3.txt").write_bytes(b"asset 3\n")
+    assert mon.check_once() == []
+    assert INTEGRITY_MISMATCHES._value.get() == 0
+
+    # the lifespan task runs passes off the loop and stops on cancel
+    async def run_briefly():
+        before = INTEGRITY_LAST_CHECK._value.get()
+        task = asyncio.create_task(mon.run(interval_s=0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return before
+    before = asyncio.run(run_briefly())
+    assert INTEGRITY_LAST_CHECK._value.get() > before
+
+def test_manifest_builder_dirs_globs_incremental_and_merkle_root(tmp_path, monkeypatch):
+    """Dirs/globs/excludes expand; --incremental re-hashes only changed files; the root is checked."""
+    import json, os
+    import app.security.integrety as integ
+    from tools import make_integrity as mk
+
+    (tmp_path / "app" / "sub").mkdir(parents=True)
+    for name in ("app/a.py", "app/sub/b.py", "app/sub/c.pyc", "static.js"):
+        (tmp_path / name).write_text(name, encoding="utf-8")
+    argv = ["--root", str(tmp_path), "app", "*.js", "--exclude", "*.pyc", "--incremental"]
+
+    hashed = []
+    real = mk.sha256_of_file
+    monkeypatch.setattr(mk, "sha256_of_file", lambda p: hashed.append(p) or real(p))
+    root = mk.main(argv)
+    data = json.loads((tmp_path / "integrity.json").read_text())
+    assert [e["path"] for e in data["files"]] == ["app/a.py", "app/sub/b.py", "static.js"]
+    assert data["merkle_root"] == root == integ.merkle_root(data["files"])
+    assert len(hashed) == 3
+
+    hashed.clear()
+    (tmp_path / "app/a.py").write_text("changed!", encoding="utf-8")
+    assert mk.main(argv) != root
+    assert hashed == [os.path.join(str(tmp_path), "app/a.py")]   # only the changed file
+
+    # verify: an entry list that doesn't hash to merkle_root is reported
+    files = [{**e, "path": str(tmp_path / e["path"])} for e in json.loads((tmp_path / "integrity.json").read_text())["files"]]
+    manifest = tmp_path / "abs.json"
+    manifest.write_text(json.dumps({"merkle_root": integ.merkle_root(files), "files": files}), encoding="utf-8")
+    cache = str(tmp_path / "cache.json")
+    assert verify_checksums(str(manifest), strict=False, cache_path=cache) == []
+    # same root vouched for by the cache: stat-only fast path, nothing re-checked
+    monkeypatch.setattr(integ, "_check_entry", lambda *a: (_ for _ in ()).throw(AssertionError("per-entry check")))
+    assert verify_checksums(str(manifest), strict=False, cache_path=cache) == []
+    monkeypatch.undo()
+
+    manifest.write_text(json.dumps({"merkle_root": integ.merkle_root(files), "files": files[:-1]}), encoding="utf-8")
+    problems = verify_checksums(str(manifest), strict=False)
+    assert problems == [{"path": str(manifest), "error": "merkle root mismatch"}]
@@ -27,3 +27,105 @@ def test_rate_limit_metric_increments():
     m = client.get("/metrics")
     assert m.status_code == 200
     assert 'rate_limit_hits_total{bucket="login"}' in m.text
+
+@pytest.mark.a09
+def test_request_metrics_use_route_templates_and_bounded_buckets():
+    from starlette.middleware import Middleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from app.security.observability import REQUESTS_TOTAL, metrics_middleware
+
+    def series():
+        return {s.labels["path"] for m in REQUESTS_TOTAL.collect() for s in m.samples if s.name.endswith("_total")}
+
+    client.post("/signup", json={"username":"labelled","password":"Strong#123","role":"candidate"})
+    t = client.post("/login", json={"username":"labelled","password":"Strong#123"}).json()["access_token"]
+    hdr = {"Authorization": f"Bearer {t}"}
+    for i in range(20):  # many distinct users / random URLs ...
+        client.get(f"/users/someone{i}", headers=hdr)
+        client.get(f"/no/such/page/{i}")
+    client.request("BREW", "/health")
+    paths = series()
+    # ... still one series per route template, one bucket for the rest
+    assert "/users/{username}" in paths and "<unmatched>" in paths
+    assert not any("someone" in p or "/no/such" in p for p in paths)
+    m = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",path="/users/{username}",status="403"}' in m
+    assert 'method="OTHER"' in m and 'method="BREW"' not in m
+
+    # the function middleware labels the same way, status from the response
+    from fastapi import FastAPI, HTTPException
+    fa = FastAPI(middleware=[Middleware(BaseHTTPMiddleware, dispatch=metrics_middleware)])
+    @fa.get("/teapots/{name}")
+    def teapot(name: str):
+        raise HTTPException(418)
+    TestClient(fa).get("/teapots/earl-grey")
+    assert 'http_requests_total{method="GET",path="/teapots/{name}",status="418"}' in client.get("/metrics").text
+
+_MULTIPROC_SCRIPT = r'''
+import os, sys
+from app.security import observability as obs
+
+def scrape():
+    return obs.collect_metrics().decode()
+
+assert obs.MULTIPROCESS
+obs.record_auth_failure("invalid_credentials")
+pid = os.fork()
+if pid == 0:  # a worker that records and exits without cleaning up
+    for _ in range(3):
+        obs.record_auth_failure("invalid_credentials")
+    obs.OUTBOUND_IN_FLIGHT.inc()
+    os._exit(0)
+os.waitpid(pid, 0)
+
+d = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+assert any(f.endswith(f"_{pid}.db") for f in os.listdir(d))
+text = scrape()  # the scrape also reaps the dead worker (folds, then collects)
+assert 'auth_failures_total{reason="invalid_credentials"} 4.0' in text, text
+assert "outbound_requests_in_flight 0.0" in text  # a dead worker's live gauge doesn't count
+files = os.listdir(d)
+assert not any(f.endswith(f"_{pid}.db") for f in files), files
+assert "counter_archive.db" in files
+obs.record_auth_failure("invalid_credentials")
+assert 'auth_failures_total{reason="invalid_credentials"} 5.0' in scrape()  # archive + live
+assert obs.reap_dead_workers() == 0
+print("ok")
+'''
+
+@pytest.mark.a09
+@pytest.mark.skipif(not hasattr(__import__("os"), "fork"), reason="needs fork")
+def test_multiprocess_metrics_aggregate_and_reap_dead_workers(tmp_path):
+    import os, subprocess, sys
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path / "prom"))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    r = subprocess.run([sys.executable, "-c", _MULTIPROC_SCRIPT], cwd=root, env=env,
+                       capture_output=True, text=True, timeout=60)
+    assert r.returncode == 0, r.stderr
+    assert r.stdout.strip().endswith("ok")
+
+@pytest.mark.a09
+def test_metrics_exposition_cached_gzipped_and_negotiated(monkeypatch):
+    from app.security import observability as obs
+    monkeypatch.setattr(obs, "METRICS_CACHE_SECONDS", 60.0)
+    obs.clear_metrics_cache()
+    try:
+        raw = {"Accept-Encoding": "identity"}
+        first = client.get("/metrics", headers=raw)
+        assert first.headers["content-type"].startswith("text/plain")
+        assert "content-encoding" not in first.headers
+        obs.record_auth_failure("cache_probe")
+        # within the TTL scrapes share one rendering (the new series isn't there yet)
+        again = client.get("/metrics", headers=raw)
+        assert again.content == first.content and "cache_probe" not in again.text
+
+        gz = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+        assert gz.headers["content-encoding"] == "gzip" and "Accept-Encoding" in gz.headers["vary"]
+        assert gz.content == first.content  # httpx decoded it
+        assert len(obs.render_metrics("", "gzip")[0]) < len(first.content)
+
+        om = client.get("/metrics", headers={**raw, "Accept": "application/openmetrics-text; version=1.0.0"})
+        assert om.headers["content-type"].startswith("application/openmetrics-text")
+        assert om.text.rstrip().endswith("# EOF") and "cache_probe" in om.text
+        assert 'metrics_render_seconds_count{format="text"}' in om.text  # earlier renders timed
+    finally:
+        obs.clear_metrics_cache()
@@ -14,3 +14,26 @@ def test_db_smoke():
         db.commit()
     finally:
         db.close()
+
+def test_async_db_smoke_wal_and_concurrent_reads():
+    """Async sessions get the SQLite pragmas; WAL lets readers run while a write is open."""
+    import asyncio
+    from sqlalchemy import select, text
+    from app.db.core import AsyncSessionLocal, DATABASE_URL, dispose_async_engine
+
+    async def run():
+        async with AsyncSessionLocal() as writer:
+            if DATABASE_URL.startswith("sqlite"):
+                assert (await writer.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+                assert (await writer.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            writer.add(User(username="user_smoke_async", password_hash="hash", role="candidate"))
+            await writer.flush()            # write transaction open, not committed
+
+            async def read():
+                async with AsyncSessionLocal() as db:
+                    return await db.scalar(select(User.id).where(User.username == "user_smoke_async"))
+            assert await asyncio.gather(*(read() for _ in range(4))) == [None] * 4
+            await writer.rollback()
+        await dispose_async_engine()
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+# tools/bench_middleware.py
+"""
+Per-request overhead of the middleware stack, before vs after fusing.
+
+  before: security_headers + metrics_middleware (function middlewares, i.e.
+          BaseHTTPMiddleware) + RequestIDMiddleware around a trivial endpoint
+  after:  SecurityObservabilityMiddleware around the same endpoint
+
+Drives the ASGI callables directly (no server, no sockets), so the numbers
+are pure middleware cost. Usage: python tools/bench_middleware.py [requests]
+"""
+import asyncio, os, sys, time
+here = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(here)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import structlog
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.security.headers import security_headers
+from app.security.logging import RequestIDMiddleware
+from app.security.middleware import SecurityObservabilityMiddleware
+from app.security.observability import metrics_middleware
+
+# Render log lines but don't print them: both stacks log the same events.
+structlog.configure(
+    processors=[structlog.processors.JSONRenderer()],
+    logger_factory=structlog.ReturnLoggerFactory(),
+)
+
+async def ok(_request):
+    return PlainTextResponse("ok")
+
+ROUTES = [Route("/health", ok)]
+
+def before_app():
+    return Starlette(routes=ROUTES, middleware=[
+        Middleware(BaseHTTPMiddleware, dispatch=metrics_middleware),
+        Middleware(RequestIDMiddleware),
+        Middleware(BaseHTTPMiddleware, dispatch=security_headers),
+    ])
+
+def after_app():
+    return Starlette(routes=ROUTES, middleware=[Middleware(SecurityObservabilityMiddleware)])
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+    "method": "GET", "scheme": "http", "path": "/health", "raw_path": b"/health",
+    "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+}
+
+async def _one(app):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(_message):
+        pass
+    await app(dict(SCOPE), receive, send)
+
+async def _run(app, n: int) -> float:
+    for _ in range(min(n, 500)):  # warm-up (lazy middleware stack build, label children)
+        await _one(app)
+    start = time.perf_counter()
+    for _ in range(n):
+        await _one(app)
+    return (time.perf_counter() - start) / n
+
+async def main(n: int):
+    bare = await _run(Starlette(routes=ROUTES), n)
+    before = await _run(before_app(), n)
+    after = await _run(after_app(), n)
+    print(f"requests per stack: {n}")
+    print(f"bare app:        {bare * 1e6:8.1f} us/request")
+    print(f"before (stacked): {before * 1e6:7.1f} us/request  (+{(before - bare) * 1e6:.1f} us overhead)")
+    print(f"after (fused):    {after * 1e6:7.1f} us/request  (+{(after - bare) * 1e6:.1f} us overhead)")
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,83 @@
+# tools/bench_pagination.py
+"""
+OFFSET vs keyset paging over the applications table.
+
+Fills a throwaway SQLite DB with N applications spread over 1,000 owners and
+times fetching one 50-row page at increasing depths, per owner and for admin.
+Usage: python tools/bench_pagination.py [rows]   (default 1,000,000)
+"""
+import asyncio, os, sys, tempfile, time
+here = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(here)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+from sqlalchemy import insert, select
+from app.db.bootstrap import init_db
+from app.db.core import AsyncSessionLocal, SessionLocal, dispose_async_engine
+from app.db.models import Application, User
+from app.db import applications as repo
+
+PAGE = 50
+OWNERS = 1000
+
+def fill(n):
+    with SessionLocal.begin() as db:
+        db.execute(insert(User), [{"username": f"u{i}", "password_hash": "", "role": "candidate"} for i in range(OWNERS)])
+        ids = db.scalars(select(User.id).order_by(User.id)).all()
+        for start in range(0, n, 50_000):
+            db.execute(insert(Application), [
+                {"title": "t", "description": "d", "owner_id": ids[i % OWNERS]}
+                for i in range(start, min(n, start + 50_000))
+            ])
+
+def offset_page(owner, skip):
+    q = select(Application.id, Application.title, Application.description, User.username).join(Application.owner)
+    if owner is not None:
+        q = q.where(User.username == owner)
+    with SessionLocal() as db:
+        return db.execute(q.order_by(Application.id).offset(skip).limit(PAGE)).all()
+
+LOOP = asyncio.new_event_loop()
+
+def keyset_page(owner, after):
+    async def page():
+        async with AsyncSessionLocal() as db:
+            return await repo.list_page(db, owner, after, PAGE)
+    return LOOP.run_until_complete(page())
+
+def best(fn, rounds=5):
+    t = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        t = min(t, time.perf_counter() - start)
+    return t * 1e3
+
+def main(n):
+    init_db()
+    fill(n)
+    for owner, total in ((None, n), ("u7", n // OWNERS)):
+        who = "admin" if owner is None else f"owner {owner}"
+        with SessionLocal() as db:
+            q = select(Application.id).join(Application.owner)
+            if owner is not None:
+                q = q.where(User.username == owner)
+            ids = db.scalars(q.order_by(Application.id)).all()
+        for frac in (0.0, 0.5, 0.99):
+            skip = int(total * frac)
+            after = ids[skip - 1] if skip else 0
+            assert [r[0] for r in offset_page(owner, skip)] == [r[0] for r in keyset_page(owner, after)]
+            off = best(lambda: offset_page(owner, skip))
+            key = best(lambda: keyset_page(owner, after))
+            print(f"{who:10s} depth {skip:>9,}   OFFSET {off:8.2f} ms   keyset {key:6.2f} ms")
+
+if __name__ == "__main__":
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
+    finally:
+        LOOP.run_until_complete(dispose_async_engine())  # pooled aiosqlite threads would block exit
+        LOOP.close()
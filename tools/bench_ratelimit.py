@@ -0,0 +1,90 @@
+# tools/bench_ratelimit.py
+"""
+Rate limiter engine under many distinct keys (e.g. one per client IP).
+
+Compares the previous sliding-log engine (a list of timestamps per key,
+never evicted) with the sliding-window engine in app.security.ratelimit
+(a bounded deque per key, idle keys evicted).
+Usage: python tools/bench_ratelimit.py [distinct_keys]   (default 2,000,000)
+"""
+import gc, os, sys, time, tracemalloc
+here = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(here)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+import app.security.ratelimit as rl
+
+LIMIT, WINDOW = 5, 60
+keys_: list[str] = []
+
+def legacy_engine():
+    buckets: dict[str, list[float]] = {}
+    def allow(key: str, limit: int, window_s: int):
+        now = time.time()
+        bucket = buckets.setdefault(key, [])
+        i = 0
+        while i < len(bucket) and bucket[i] < now - window_s:
+            i += 1
+        if i:
+            del bucket[:i]
+        if len(bucket) < limit:
+            bucket.append(now)
+            return True, 0
+        return False, max(int(window_s - (now - bucket[0])) + 1, 1)
+    return allow, buckets
+
+def _drive(allow, keys):
+    for k in keys:
+        allow(k, LIMIT, WINDOW)
+        allow(k, LIMIT, WINDOW)
+
+def run(name, make):
+    allow, store = make()
+    gc.collect()
+    start = time.perf_counter()
+    _drive(allow, keys_)
+    elapsed = time.perf_counter() - start
+    held = len(store)
+    store.clear()
+    # second pass under tracemalloc for memory only (tracing skews timing)
+    allow, store = make()
+    gc.collect()
+    tracemalloc.start()
+    _drive(allow, keys_)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    store.clear()
+    checks = 2 * len(keys_)
+    print(f"{name:8s} {elapsed / checks * 1e9:8.0f} ns/check   "
+          f"peak {peak / 2**20:8.1f} MiB   keys held {held:,}")
+
+def window_engine():
+    rl.reset_rate_limits()
+    return rl._allow, rl._BUCKETS
+
+def main(n: int):
+    global keys_
+    keys_ = [f"login:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}#{i}" for i in range(n)]
+    print(f"{n:,} distinct keys, 2 checks each (limit={LIMIT}/{WINDOW}s)")
+    run("legacy", legacy_engine)
+    run("window", window_engine)
+    _drive(rl._allow, keys_)  # repopulate for the eviction run
+
+    # Idle eviction: jump past the window; new traffic drains the old keys.
+    real = rl.time.monotonic
+    rl.time.monotonic = lambda: real() + WINDOW + 1
+    try:
+        start = time.perf_counter()
+        i = 0
+        while len(rl._BUCKETS) > i:  # anything beyond the new keys is stale
+            rl._allow(f"login:new#{i}", LIMIT, WINDOW)
+            i += 1
+        print(f"window idle eviction: {n:,} stale keys drained by {i:,} new checks "
+              f"in {time.perf_counter() - start:.2f}s")
+    finally:
+        rl.time.monotonic = real
+        rl.reset_rate_limits()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,71 @@
+# tools/bench_ssrf_match.py
+"""
+SSRF decision cost with large allow-lists and CIDR blocklists.
+
+Compares the previous linear scans (walk every allow-list entry; build an
+ipaddress object + six-element list per address) with the compiled
+HostMatcher / CidrIndex used by app.security.ssrf.
+Usage: python tools/bench_ssrf_match.py [host_entries]   (default 10,000)
+"""
+import ipaddress, os, random, sys, time
+here = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.dirname(here)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.security.netmatch import CidrIndex, HostMatcher
+from app.security.ssrf import _addr_is_private
+
+def legacy_host_is_allowed(host, allow):
+    host = host.lower()
+    for entry in allow:
+        e = entry.lower()
+        if host == e:
+            return True
+        if e.startswith(".") and host.endswith(e):
+            return True
+    return False
+
+def legacy_addr_blocked(addr, networks):
+    ip = ipaddress.ip_address(addr)
+    if any([ip.is_private, ip.is_loopback, ip.is_link_local, ip.is_reserved, ip.is_multicast, ip.is_unspecified]):
+        return True
+    return any(ip in net for net in networks)
+
+def timeit(fn, items, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for x in items:
+            fn(x)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e9
+
+def main(n: int):
+    rnd = random.Random(7)
+    allow = [f"partner{i}.example.com" if i % 2 else f".tenant{i}.example.net" for i in range(n)]
+    hosts = [f"api.tenant{rnd.randrange(n) // 2 * 2}.example.net" for _ in range(500)] + \
+            [f"partner{rnd.randrange(n) | 1}.example.com" for _ in range(500)] + \
+            [f"unknown{i}.example.org" for i in range(1000)]  # misses: worst case for the scan
+    matcher = HostMatcher(allow)
+    assert all(matcher.matches(h) == legacy_host_is_allowed(h, allow) for h in hosts[:200])
+    lin = timeit(lambda h: legacy_host_is_allowed(h, allow), hosts, rounds=1)
+    comp = timeit(matcher.matches, hosts)
+    print(f"hosts: {n:,} entries   linear {lin:10.0f} ns/check   compiled {comp:6.0f} ns/check")
+
+    cidrs = [f"{rnd.randrange(1, 223)}.{rnd.randrange(256)}.{rnd.randrange(256)}.0/24" for _ in range(n)]
+    networks = [ipaddress.ip_network(c) for c in cidrs]
+    index = CidrIndex(cidrs)
+    addrs = [f"{rnd.randrange(1, 223)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}" for _ in range(2000)]
+
+    def compiled(addr):
+        ip = ipaddress.ip_address(addr)
+        return _addr_is_private(ip) or index.contains(ip)
+
+    assert all(compiled(a) == legacy_addr_blocked(a, networks) for a in addrs[:200])
+    lin = timeit(lambda a: legacy_addr_blocked(a, networks), addrs[:200], rounds=1)
+    comp = timeit(compiled, addrs)
+    print(f"cidrs: {n:,} ranges    linear {lin:10.0f} ns/check   compiled {comp:6.0f} ns/check")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -1,28 +1,118 @@
 # tools/make_integrity.py
-import os, sys, json
+"""
+Build integrity.json from files, directories and glob patterns.
+
+  python tools/make_integrity.py                       # assets/demo.txt
+  python tools/make_integrity.py app assets "static/**/*.js" --exclude "*.pyc" --exclude "*/__pycache__/*"
+  python tools/make_integrity.py app --incremental     # re-hash only files whose size/mtime changed
+
+Paths are stored relative to --root (default: repo root) with "/" separators.
+Files are hashed concurrently; the manifest carries a merkle_root that
+verify_checksums checks before (and, with its cache, instead of) comparing
+entry by entry.
+"""
+import argparse, fnmatch, glob, os, sys, json, time
+from concurrent.futures import ThreadPoolExecutor
 here = os.path.dirname(os.path.abspath(__file__))
 repo_root = os.path.dirname(here)
 if repo_root not in sys.path:
     sys.path.insert(0, repo_root)
 
-from app.security.integrety import sha256_of_file, _repo_root
+from app.security.integrety import merkle_root, sha256_of_file, _repo_root
+from app.security.settings import INTEGRITY_CACHE, INTEGRITY_WORKERS
 
 DEFAULT_FILES = ["assets/demo.txt"]
 
-def main(paths):
-    base = _repo_root()
-    files = paths or DEFAULT_FILES
-    entries = []
-    for rel in files:
-        full = os.path.join(base, rel)
-        if not os.path.exists(full):
-            raise SystemExit(f"Missing file: {rel}")
-        digest, size = sha256_of_file(full)
-        entries.append({"path": rel, "sha256": digest, "bytes": size})
-    out = os.path.join(base, "integrity.json")
-    with open(out, "w", encoding="utf-8") as fh:
-        json.dump({"files": entries}, fh, indent=2)
-    print(f"Wrote integrity.json with {len(entries)} file(s)")
+def _rel(base, full):
+    return os.path.relpath(full, base).replace(os.sep, "/")
+
+def _walk(top):
+    stack = [top]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for de in it:
+                if de.is_dir(follow_symlinks=False):
+                    stack.append(de.path)
+                elif de.is_file(follow_symlinks=False):
+                    yield de.path
+
+def collect(base, inputs, excludes=()):
+    """Expand files / directories / globs under `base` to sorted relative paths."""
+    found = set()
+    for item in inputs:
+        full = os.path.join(base, item)
+        if glob.has_magic(item):
+            matches = glob.glob(full, recursive=True)
+            files = [m for m in matches if os.path.isfile(m)]
+            for d in (m for m in matches if os.path.isdir(m)):
+                files.extend(_walk(d))
+        elif os.path.isdir(full):
+            files = _walk(full)
+        elif os.path.isfile(full):
+            files = [full]
+        else:
+            raise SystemExit(f"Missing file: {item}")
+        for f in files:
+            rel = _rel(base, f)
+            if not any(fnmatch.fnmatch(rel, pat) for pat in excludes):
+                found.add(rel)
+    return sorted(found)
+
+def _load_previous(path):
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+    files = data.get("files", []) if isinstance(data, dict) else data
+    return {e["path"]: e for e in files if "mtime_ns" in e}
+
+def build(base, rel_paths, previous=None, workers=INTEGRITY_WORKERS):
+    """-> (entries, hashed_count). `previous` entries with equal size+mtime are reused."""
+    previous = previous or {}
+
+    def entry(rel):
+        st = os.stat(os.path.join(base, rel))
+        old = previous.get(rel)
+        if old and old.get("bytes") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            return old, False
+        digest, size = sha256_of_file(os.path.join(base, rel))
+        return {"path": rel, "sha256": digest, "bytes": size, "mtime_ns": st.st_mtime_ns}, True
+
+    if len(rel_paths) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(rel_paths))) as pool:
+            results = list(pool.map(entry, rel_paths))
+    else:
+        results = [entry(rel) for rel in rel_paths]
+    return [e for e, _ in results], sum(1 for _, h in results if h)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write an integrity manifest.")
+    ap.add_argument("inputs", nargs="*", help="files, directories or glob patterns (relative to --root)")
+    ap.add_argument("--exclude", action="append", default=[], help="fnmatch pattern on the relative path (repeatable)")
+    ap.add_argument("--root", default=None, help="base directory (default: repo root)")
+    ap.add_argument("-o", "--output", default="integrity.json", help="manifest path (relative to --root)")
+    ap.add_argument("--incremental", action="store_true", help="reuse hashes of files whose size and mtime are unchanged")
+    ap.add_argument("--workers", type=int, default=INTEGRITY_WORKERS)
+    args = ap.parse_args(argv)
+
+    base = os.path.abspath(args.root or _repo_root())
+    out = os.path.join(base, args.output)
+    # never hash our own outputs
+    excludes = args.exclude + [_rel(base, out)] + ([INTEGRITY_CACHE] if INTEGRITY_CACHE else [])
+
+    started = time.perf_counter()
+    paths = collect(base, args.inputs or DEFAULT_FILES, excludes)
+    previous = _load_previous(out) if args.incremental else {}
+    entries, hashed = build(base, paths, previous, workers=args.workers)
+    root = merkle_root(entries)
+    tmp = f"{out}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"merkle_root": root, "files": entries}, fh, indent=2)
+    os.replace(tmp, out)
+    print(f"Wrote {args.output} with {len(entries)} file(s), {hashed} hashed "
+          f"in {time.perf_counter() - started:.2f}s (root {root[:16]}...)")
+    return root
 
 if __name__ == "__main__":
     main(sys.argv[1:])